@@ -1,6 +1,6 @@
 """
 CHROMOSOME FASTA FILE READER
-(version 1.0)
+(version 1.6)
 by Angelo Chan
 
 This module contains a Class capable of reading and interpretting FASTA files
@@ -11,6 +11,12 @@ which contain a single Chromosome.
 
 from File_Reader import *
 
+from FASTA_File_Reader import SEQ_FORMAT
+from Packed_Sequence import *
+from Sequence_Array import *
+
+import re
+
 
 
 # Lists ########################################################################
@@ -19,6 +25,26 @@ LIST__nucleotide_chars = ["A", "C", "G", "T", "a", "c", "g", "t", "N", "n"]
 
 
 
+# Strings ######################################################################
+
+BYTES__non_nucleotide = bytes(bytearray(
+        [i for i in range(256) if chr(i) not in LIST__nucleotide_chars]))
+
+
+
+# Regular Expressions ##########################################################
+
+REGEX__non_nucleotide = re.compile(
+        "[^" + "".join(LIST__nucleotide_chars) + "]+")
+
+
+
+# Dictionaries #################################################################
+
+DICT__size_cache = {} # File stamp : Number of nucleotides
+
+
+
 # Classes ######################################################################
 
 class Chr_FASTA_Reader(File_Reader):
@@ -46,6 +72,9 @@ class Chr_FASTA_Reader(File_Reader):
     _CONFIG__print_progress = False
     _CONFIG__print_metrics = True
     
+    _CONFIG__block_size = 1048576 # Number of characters read from the file at
+    #                               once
+    
     
     
     # Strings ##################################################################
@@ -53,6 +82,9 @@ class Chr_FASTA_Reader(File_Reader):
     _MSG__object_type = "Chromosome FASTA File Reader"
     _MSG__units_of_measure = "Nucleotides"
     
+    _MSG__invalid_seq_format = "ERROR: Invalid sequence format."
+    _MSG__no_numpy = "ERROR: " + STR__no_numpy
+    
     # Constructor & Destructor #################################################
     
     def __init__(self, file_path="", auto_open=False):
@@ -61,6 +93,13 @@ class Chr_FASTA_Reader(File_Reader):
         tested if a filepath is supplied.
         """
         self.name = ""
+        self.buffer = ""
+        self.buffer_index = 0
+        self.file_random = None
+        self.seq_offset = 0
+        self.line_bases = 0
+        self.line_bytes = 0
+        self.seq_format = SEQ_FORMAT.STR
         File_Reader.__init__(self, file_path, auto_open)
     
     
@@ -73,6 +112,34 @@ class Chr_FASTA_Reader(File_Reader):
         """
         return self.name
     
+    def Set_Seq_Format(self, seq_format):
+        """
+        Set the format in which sequences returned by Fetch() and
+        Iterate_Windows() are returned:
+            SEQ_FORMAT.STR          Strings (Default)
+            SEQ_FORMAT.BYTES        Bytes
+            SEQ_FORMAT.BYTEARRAY    Mutable bytearrays
+            SEQ_FORMAT.PACKED       Packed_Sequence objects
+            SEQ_FORMAT.NUMPY        NumPy arrays of unsigned 8-bit integers
+                                    (Requires NumPy. See Sequence_Array)
+        
+        Individual nucleotides returned by Read() and Get() are always strings.
+        """
+        if seq_format == SEQ_FORMAT.NUMPY and numpy is None:
+            self.printE(self._MSG__no_numpy)
+            return
+        if seq_format not in [SEQ_FORMAT.STR, SEQ_FORMAT.BYTES,
+                SEQ_FORMAT.BYTEARRAY, SEQ_FORMAT.PACKED, SEQ_FORMAT.NUMPY]:
+            self.printE(self._MSG__invalid_seq_format)
+            return
+        self.seq_format = seq_format
+    
+    def Get_Seq_Format(self):
+        """
+        Return the format in which sequences are returned.
+        """
+        return self.seq_format
+    
     def Copy_Element(self, element):
         """
         (Strings do not require a special copy method)
@@ -83,24 +150,67 @@ class Chr_FASTA_Reader(File_Reader):
         """
         Return the size of the chromosome in the FASTA file.
         
+        The file is counted one large block at a time, and the result is cached
+        for as long as the file remains unchanged.
+        
         Return -1 if no filepath has been set.
         """
         if self.file_path:
+            stamp = self.Get_File_Stamp()
+            if stamp in DICT__size_cache: return DICT__size_cache[stamp]
             count = 0
-            f = open(self.file_path, "U")
+            f = open(self.file_path, "rb")
             f.readline()
-            char = f.read(1)
-            while char:
-                if char in LIST__nucleotide_chars: count += 1
-                char = f.read(1)
+            block = f.read(self._CONFIG__block_size)
+            while block:
+                count += len(block.translate(None, BYTES__non_nucleotide))
+                block = f.read(self._CONFIG__block_size)
             f.close()
+            if stamp: DICT__size_cache[stamp] = count
             return count
         return -1
     
     
     
+    def Get_Packed(self):
+        """
+        Return the entire sequence of the chromosome as a Packed_Sequence
+        object, which stores each nucleotide using 2 bits and records runs of Ns
+        and lowercase nucleotides separately.
+        
+        The file is packed one block at a time, so the full sequence is never
+        held in memory as a string. Does not affect the current position of the
+        reader.
+        
+        Return None if no filepath has been set.
+        """
+        if not self.file_path:
+            self.printE(self._MSG__unspecified_file_path)
+            return None
+        seq = Packed_Sequence()
+        f = open(self.file_path, "rb")
+        f.readline()
+        block = f.read(self._CONFIG__block_size)
+        while block:
+            seq.Append(REGEX__non_nucleotide.sub("", block))
+            block = f.read(self._CONFIG__block_size)
+        f.close()
+        return seq
+    
+    
+    
     # File I/O Methods #########################################################
     
+    def Close(self):
+        """
+        Close the object's file, and the file handle used for random access, if
+        they are open.
+        """
+        if self.file_random:
+            self.file_random.close()
+            self.file_random = None
+        File_Reader.Close(self)
+    
     # File Reading Methods #####################################################
     
     def Read_Header(self):
@@ -112,18 +222,188 @@ class Chr_FASTA_Reader(File_Reader):
         if line[-1] in LIST__newline: line = line[:-1]
         values = line.split(" ")
         self.name = values[0]
+        self.buffer = ""
+        self.buffer_index = 0
+        self._detect_line_width()
+    
+    def _detect_line_width(self):
+        """
+        Determine the byte offset at which the sequence starts, as well as the
+        number of nucleotides and bytes per line, using the first line of the
+        sequence. A separate file handle is kept open for random access.
+        
+        All lines of the sequence, except the last, are assumed to be of the
+        same width, as is the case for standard FASTA files.
+        """
+        if self.file_random: self.file_random.close()
+        self.file_random = open(self.file_path, "rb")
+        self.file_random.readline()
+        self.seq_offset = self.file_random.tell()
+        line = self.file_random.readline()
+        if line[:1] == ">": line = ""
+        self.line_bytes = len(line)
+        self.line_bases = len(line.rstrip("\r\n"))
+    
+    def _get_byte_offset(self, position):
+        """
+        Return the byte offset in the file of the nucleotide at [position].
+        """
+        lines, remainder = divmod(position, self.line_bases)
+        return self.seq_offset + (lines * self.line_bytes) + remainder
+    
+    def Seek(self, position):
+        """
+        Move the reader to the nucleotide at [position] without reading through
+        the preceding sequence. The next call to Read() will make that
+        nucleotide the "current" element.
+        
+        Uses a 0-index system. (The first nucleotide is at position 0)
+        
+        Return 0 if successful.
+        Return 1 if the file is not open or the position is invalid.
+        """
+        if not self.file_opened or position < 0 or not self.line_bases:
+            return 1
+        self.file.seek(self._get_byte_offset(position))
+        self.buffer = ""
+        self.buffer_index = 0
+        self.current_element = self.empty_element
+        self.next_element = self._get_next_element()
+        self.current_index = position
+        self.EOF = self.Is_Empty_Element(self.next_element)
+        if self.EOF: self.printP(self._MSG__EOF_reached)
+        return 0
+    
+    def Fetch(self, start, end):
+        """
+        Return the nucleotide sequence from [start] to [end] without reading
+        through the preceding sequence.
+        
+        Uses a 0-index system, and the end coordinate is exclusive. (The
+        sequence from start to end is the same as would be obtained by slicing
+        the full chromosome sequence with [start:end])
+        
+        Does not affect the current position of the reader.
+        
+        Return an empty sequence if the file is not open or the range is empty.
+        """
+        if not self.file_random or not self.line_bases:
+            return self._format_seq("")
+        if start < 0: start = 0
+        if end <= start: return self._format_seq("")
+        byte_start = self._get_byte_offset(start)
+        byte_end = self._get_byte_offset(end - 1) + 1
+        self.file_random.seek(byte_start)
+        seq = self.file_random.read(byte_end - byte_start)
+        return self._format_seq(seq.replace("\n", "").replace("\r", ""))
     
     def _get_next_element(self):
         """
-        Read up to the next nucleotide character and return it.
+        Return the next nucleotide character in the file.
+        
+        Nucleotides are served from an in-memory buffer which is refilled one
+        large block at a time, rather than reading the file one character at a
+        time.
         
         Return an empty string if the end of the file has been reached.
         """
-        char = self.file.read(1)
-        while char and char not in LIST__nucleotide_chars:
-            char = self.file.read(1)
+        if self.buffer_index >= len(self.buffer):
+            self._fill_buffer()
+            if not self.buffer: return ""
+        char = self.buffer[self.buffer_index]
+        self.buffer_index += 1
         return char
     
+    def Iterate_Windows(self, window, step=0, keep_partial=False):
+        """
+        Iterate through the rest of the chromosome in windows of [window]
+        nucleotides, moving [step] nucleotides each time, and yield each window
+        as a (start, end, sequence) tuple.
+        
+        The coordinates use a 0-index system, and the end coordinate is
+        exclusive. Iteration begins at the next unread nucleotide, so calling
+        this method straight after Open() covers the entire chromosome.
+        
+        If no [step] is specified, the windows will not overlap. If
+        [keep_partial] is True, a final window which is shorter than [window]
+        will also be yielded, provided it contains nucleotides not covered by
+        any previous window.
+        
+        Only the current window is kept in memory. The end of the file will have
+        been reached once the iteration is finished.
+        
+        Designed for the following use:
+        
+        f = Chr_FASTA_Reader()
+        f.Open("F:/Filepath.fa")
+        for start, end, seq in f.Iterate_Windows(1000, 200):
+            # Your code
+        f.Close()
+        """
+        if not step: step = window
+        if self.EOF: return
+        start = self.current_index
+        prev_end = start
+        seq = self.next_element + self._read_nucleotides(window - 1)
+        while len(seq) == window:
+            yield (start, start + window, self._format_seq(seq))
+            prev_end = start + window
+            if step < window:
+                seq = seq[step:] + self._read_nucleotides(step)
+            else:
+                self._read_nucleotides(step - window, False)
+                seq = self._read_nucleotides(window)
+            start += step
+        if keep_partial and seq and start + len(seq) > prev_end:
+            yield (start, start + len(seq), self._format_seq(seq))
+        self.current_element = self.next_element = self.empty_element
+        self.EOF = True
+        self.printP(self._MSG__EOF_reached)
+    
+    def _format_seq(self, seq):
+        """
+        Return the sequence string [seq] in the current sequence format.
+        """
+        if self.seq_format == SEQ_FORMAT.BYTES: return bytes(seq)
+        if self.seq_format == SEQ_FORMAT.BYTEARRAY: return bytearray(seq)
+        if self.seq_format == SEQ_FORMAT.PACKED: return Packed_Sequence(seq)
+        if self.seq_format == SEQ_FORMAT.NUMPY:
+            return Seq_To_Array(bytearray(seq))
+        return seq
+    
+    def _read_nucleotides(self, number, keep=True):
+        """
+        Read up to [number] nucleotides from the buffer, refilling it as
+        necessary, and return them as a single string.
+        
+        If [keep] is False, the nucleotides are skipped over and an empty string
+        is returned instead.
+        """
+        sb = []
+        while number > 0:
+            if self.buffer_index >= len(self.buffer):
+                self._fill_buffer()
+                if not self.buffer: break
+            chunk = self.buffer[self.buffer_index:self.buffer_index + number]
+            self.buffer_index += len(chunk)
+            number -= len(chunk)
+            if keep: sb.append(chunk)
+        return "".join(sb)
+    
+    def _fill_buffer(self):
+        """
+        Read the next block of the file into the buffer, with all newlines and
+        other non-nucleotide characters removed.
+        
+        The buffer will be left empty if the end of the file has been reached.
+        """
+        self.buffer = ""
+        self.buffer_index = 0
+        while not self.buffer:
+            block = self.file.read(self._CONFIG__block_size)
+            if not block: return
+            self.buffer = REGEX__non_nucleotide.sub("", block)
+    
     def Is_Empty_Element(self, element):
         """
         Return True if [element] is an "empty" element, that is to say, an empty
@@ -1,15 +1,33 @@
 """
 FASTA FILE READER
-(version 1.0)
+(version 1.6)
 by Angelo Chan
 
 This module contains a Class capable of reading and interpretting FASTA files.
+
+FASTA files can also be indexed using a samtools-compatible FASTA index (.fai)
+file, allowing sequences to be accessed by name without reading through the
+entire file, and cached as a .2bit file of packed sequences.
 """
 
 # Imported Modules #############################################################
 
 from File_Reader import *
 
+from Packed_Sequence import *
+from Sequence_Array import *
+
+
+
+# Enums ########################################################################
+
+class SEQ_FORMAT:
+    STR=1
+    BYTES=2
+    BYTEARRAY=3
+    PACKED=4
+    NUMPY=5
+
 
 
 # Lists ########################################################################
@@ -44,6 +62,9 @@ class FASTA_Reader(File_Reader):
     _CONFIG__print_progress = False
     _CONFIG__print_metrics = True
     
+    _CONFIG__block_size = 1048576 # Number of characters read from the file at
+    #                               once when streaming sequences
+    
     
     
     # Strings ##################################################################
@@ -51,6 +72,19 @@ class FASTA_Reader(File_Reader):
     _MSG__object_type = "FASTA File Reader"
     _MSG__units_of_measure = "Sequences"
     
+    _MSG__index_inconsistent = "ERROR: Sequence \"{NAME}\" has lines of "\
+            "inconsistent width. The FASTA file could not be indexed."
+    _MSG__index_duplicate = "WARNING: Duplicate sequence name \"{NAME}\". "\
+            "Only the first sequence with this name will be indexed."
+    _MSG__index_write_fail = "WARNING: Unable to write the index file "\
+            "\"{PATH}\". The index will only be kept in memory."
+    _MSG__2bit_write_fail = "WARNING: Unable to write the .2bit cache file "\
+            "\"{PATH}\"."
+    _MSG__index_not_found = "ERROR: Sequence \"{NAME}\" is not in the index."
+    
+    _MSG__invalid_seq_format = "ERROR: Invalid sequence format."
+    _MSG__no_numpy = "ERROR: " + STR__no_numpy
+    
     # Constructor & Destructor #################################################
     
     def __init__(self, file_path="", auto_open=False):
@@ -58,6 +92,13 @@ class FASTA_Reader(File_Reader):
     `   Creates a Chromsome FASTA File Reader object. The filepath will be
         tested if a filepath is supplied.
         """
+        self.index = {}
+        self.index_names = []
+        self.index_path = ""
+        self.file_random = None
+        self.seq_format = SEQ_FORMAT.STR
+        self.streaming = False
+        self._reset_stream()
         File_Reader.__init__(self, file_path, auto_open)
     
     
@@ -82,19 +123,94 @@ class FASTA_Reader(File_Reader):
         """
         return self.current_element[2]
     
+    def Set_Seq_Format(self, seq_format):
+        """
+        Set the format in which nucleotide sequences are returned:
+            SEQ_FORMAT.STR          Strings (Default)
+            SEQ_FORMAT.BYTES        Bytes
+            SEQ_FORMAT.BYTEARRAY    Mutable bytearrays
+            SEQ_FORMAT.PACKED       Packed_Sequence objects, which store each
+                                    nucleotide using 2 bits
+            SEQ_FORMAT.NUMPY        NumPy arrays of unsigned 8-bit integers
+                                    (Requires NumPy. See Sequence_Array)
+        
+        For formats other than strings, the file is read in binary mode,
+        skipping the decoding and newline translation which text mode entails.
+        The new format takes effect the next time a file is opened.
+        """
+        if seq_format == SEQ_FORMAT.NUMPY and numpy is None:
+            self.printE(self._MSG__no_numpy)
+            return
+        if seq_format == SEQ_FORMAT.STR:
+            self._CONFIG__file_mode = "U"
+        elif seq_format in [SEQ_FORMAT.BYTES, SEQ_FORMAT.BYTEARRAY,
+                SEQ_FORMAT.PACKED, SEQ_FORMAT.NUMPY]:
+            self._CONFIG__file_mode = "rb"
+        else:
+            self.printE(self._MSG__invalid_seq_format)
+            return
+        self.seq_format = seq_format
+    
+    def Get_Seq_Format(self):
+        """
+        Return the format in which nucleotide sequences are returned.
+        """
+        return self.seq_format
+    
+    def Set_Streaming(self, boolean):
+        """
+        Set whether or not the reader streams nucleotide sequences instead of
+        reading each sequence in its entirety.
+        
+        When streaming, each Read() only reads the name and annotation of the
+        next sequence. The nucleotide sequence itself can then be read in
+        chunks of a bounded size using Read_Seq_Chunk() or Iterate_Seq(), and
+        Get_Seq() will return an empty sequence. Memory usage is therefore
+        independent of the length of the sequences.
+        
+        The new setting takes effect the next time a file is opened.
+        
+        Designed for the following use:
+        
+        f = FASTA_Reader()
+        f.Set_Streaming(True)
+        f.Open("F:/Filepath.fa")
+        while not f.End():
+            f.Read()
+            name = f.Get_Name()
+            for chunk in f.Iterate_Seq(1000000):
+                # Your code
+        f.Close()
+        """
+        self.streaming = boolean
+    
     def Copy_Element(self, element):
         """
         Return a copy of the current element.
+        
+        Bytearray, packed, and array sequences are also copied, since they are
+        mutable.
         """
-        return list(element)
+        copy = list(element)
+        for i in range(len(copy)):
+            if type(copy[i]) == bytearray: copy[i] = bytearray(copy[i])
+            elif isinstance(copy[i], Packed_Sequence): copy[i] = copy[i].Copy()
+            elif numpy and isinstance(copy[i], numpy.ndarray):
+                copy[i] = copy[i].copy()
+        return copy
     
     def Get_Size(self):
         """
         Return the number of sequences in the FASTA file.
         
+        If the FASTA file has been indexed, the index is used instead of reading
+        through the file.
+        
         Return -1 if no filepath has been set.
         """
         if self.file_path:
+            if self.index_path != self.file_path: self.Load_Index()
+            if self.index_path == self.file_path: return len(self.index_names)
             count = 0
             f = open(self.file_path, "U")
             line = f.readline()
@@ -107,10 +223,305 @@ class FASTA_Reader(File_Reader):
     
     
     
+    # Index Methods ############################################################
+    
+    def Get_Index_Path(self):
+        """
+        Return the file path of the FASTA index file for the current file.
+        """
+        return self.file_path + ".fai"
+    
+    def Build_Index(self, write=True):
+        """
+        Index the current FASTA file in a single pass through the file. The
+        index records the length of each sequence, the byte offset at which it
+        starts, and the number of nucleotides and bytes per line.
+        
+        If [write] is True, the index will also be written to a samtools-
+        compatible .fai file alongside the FASTA file.
+        
+        Return 0 if successful.
+        Return 1 if no filepath has been set.
+        Return 2 if the FASTA file could not be indexed.
+        """
+        if not self.file_path:
+            self.printE(self._MSG__unspecified_file_path)
+            return 1
+        index = {}
+        names = []
+        entry = None
+        short = False
+        offset = 0
+        f = open(self.file_path, "rb")
+        for line in f:
+            if line[:1] == ">":
+                name = line[1:].split(None, 1)
+                if name: name = name[0]
+                else: name = ""
+                if name in index:
+                    self.printE(self._MSG__index_duplicate.format(NAME = name))
+                    entry = None
+                else:
+                    entry = [0, offset + len(line), 0, 0, len(names)]
+                    index[name] = entry
+                    names.append(name)
+                short = False
+            elif entry:
+                bases = len(line.rstrip("\r\n"))
+                if not entry[2]:
+                    entry[2] = bases
+                    entry[3] = len(line)
+                elif short or bases > entry[2]:
+                    if bases:
+                        f.close()
+                        self.printE(self._MSG__index_inconsistent.format(
+                                NAME = names[-1]))
+                        return 2
+                if bases < entry[2]: short = True
+                entry[0] += bases
+            offset += len(line)
+        f.close()
+        self.index = index
+        self.index_names = names
+        self.index_path = self.file_path
+        if write: self.Write_Index()
+        return 0
+    
+    def Write_Index(self, index_path=""):
+        """
+        Write the current index to a samtools-compatible .fai file. If no file
+        path is specified, the index will be written alongside the FASTA file.
+        
+        Return 0 if successful.
+        Return 1 if the index file could not be written.
+        """
+        if not index_path: index_path = self.Get_Index_Path()
+        try:
+            o = open(index_path, "w")
+        except:
+            self.printE(self._MSG__index_write_fail.format(PATH = index_path))
+            return 1
+        for name in self.index_names:
+            values = [name] + [str(i) for i in self.index[name][:4]]
+            o.write("\t".join(values) + "\n")
+        o.close()
+        return 0
+    
+    def Load_Index(self, index_path=""):
+        """
+        Load the index of the current FASTA file from a .fai file. If no file
+        path is specified, the .fai file alongside the FASTA file will be used.
+        
+        An index file which is older than the FASTA file is not loaded.
+        
+        Return 0 if successful.
+        Return 1 if the index file could not be found or is out of date.
+        """
+        if not index_path: index_path = self.Get_Index_Path()
+        stamp_index = self.Get_File_Stamp(index_path)
+        stamp_fasta = self.Get_File_Stamp()
+        if not stamp_index or not stamp_fasta: return 1
+        if stamp_index[2] < stamp_fasta[2]: return 1
+        index = {}
+        names = []
+        f = open(index_path, "U")
+        for line in f:
+            values = line.rstrip("\n").split("\t")
+            if len(values) < 5: continue
+            entry = [int(i) for i in values[1:5]] + [len(names)]
+            index[values[0]] = entry
+            names.append(values[0])
+        f.close()
+        self.index = index
+        self.index_names = names
+        self.index_path = self.file_path
+        return 0
+    
+    def Get_Index(self):
+        """
+        Return the index of the current FASTA file, loading or building it if
+        necessary.
+        
+        The index is a dictionary of sequence names to lists of the sequence
+        length, byte offset, nucleotides per line, bytes per line, and the
+        position of the sequence in the file.
+        """
+        if self.index_path != self.file_path:
+            if self.Load_Index(): self.Build_Index()
+        return self.index
+    
+    def Get_Names(self):
+        """
+        Return a list of the names of all the sequences in the FASTA file, in
+        the order in which they appear, using the index.
+        """
+        self.Get_Index()
+        return list(self.index_names)
+    
+    def Fetch(self, name, start=0, end=None):
+        """
+        Return the nucleotide sequence of the sequence named [name], or the part
+        of it from [start] to [end], using the index. The index will be loaded
+        or built if necessary.
+        
+        Uses a 0-index system, and the end coordinate is exclusive. (The
+        sequence from start to end is the same as would be obtained by slicing
+        the full sequence with [start:end])
+        
+        Does not affect the current position of the reader.
+        
+        Return None if there is no sequence named [name].
+        """
+        entry = self.Get_Index().get(name)
+        if not entry:
+            self.printE(self._MSG__index_not_found.format(NAME = name))
+            return None
+        length, offset, line_bases, line_bytes = entry[:4]
+        if start < 0: start = 0
+        if end == None or end > length: end = length
+        if end <= start: return ""
+        byte_start = offset + (start // line_bases) * line_bytes + \
+                (start % line_bases)
+        byte_end = offset + ((end - 1) // line_bases) * line_bytes + \
+                ((end - 1) % line_bases) + 1
+        if not self.file_random: self.file_random = open(self.file_path, "rb")
+        self.file_random.seek(byte_start)
+        seq = self.file_random.read(byte_end - byte_start)
+        return seq.replace("\n", "").replace("\r", "")
+    
+    def Seek(self, name):
+        """
+        Move the reader to the sequence named [name] using the index, without
+        reading through the preceding sequences. The next call to Read() will
+        make that sequence the "current" element.
+        
+        Return 0 if successful.
+        Return 1 if the file is not open.
+        Return 2 if there is no sequence named [name].
+        """
+        if not self.file_opened: return 1
+        entry = self.Get_Index().get(name)
+        if not entry:
+            self.printE(self._MSG__index_not_found.format(NAME = name))
+            return 2
+        # Find the start of the header line
+        if not self.file_random: self.file_random = open(self.file_path, "rb")
+        header_end = entry[1]
+        size = 256
+        while True:
+            block_start = max(header_end - size, 0)
+            self.file_random.seek(block_start)
+            block = self.file_random.read(header_end - block_start)
+            newline = block.rstrip("\r\n").rfind("\n")
+            if newline != -1:
+                header_start = block_start + newline + 1
+                break
+            if block_start == 0:
+                header_start = 0
+                break
+            size *= 4
+        # Prime the reader
+        self.file.seek(header_start)
+        self.next_element = self.Copy_Element(self.empty_element)
+        self.current_element = self.Copy_Element(self.empty_element)
+        self.current_index = entry[4] - 1
+        self.EOF = False
+        self._reset_stream()
+        self._read()
+        return 0
+    
+    
+    
+    def End(self):
+        """
+        Return True if the end of file has been reached.
+        Return False otherwise.
+        
+        When streaming, the file is looked ahead through to determine whether
+        there are any sequences left, without reading any of the current
+        nucleotide sequence. The result is kept until the next Read().
+        """
+        if self.streaming and self.stream_primed and not self.EOF:
+            if self.stream_seq_done: return False
+            if self.stream_has_next is None:
+                self.stream_has_next = self._peek_header_stream()
+            return not self.stream_has_next
+        return self.EOF
+    
+    
+    
+    # Packed Sequence Methods ##################################################
+    
+    def Get_2bit_Path(self):
+        """
+        Return the file path of the .2bit cache file for the current file.
+        """
+        return self.file_path + ".2bit"
+    
+    def Load_2bit_Cache(self, cache_path=""):
+        """
+        Return the names of all the sequences in the FASTA file, and a
+        dictionary of all the sequences as Packed_Sequence objects.
+        
+        The sequences are loaded from a .2bit cache file if an up-to-date one
+        exists. Otherwise, the FASTA file is read, one bounded chunk at a time,
+        and the cache file is written for future use. If no file path is
+        specified, the cache file alongside the FASTA file will be used.
+        
+        Return None if no filepath has been set.
+        """
+        if not self.file_path:
+            self.printE(self._MSG__unspecified_file_path)
+            return None
+        if not cache_path: cache_path = self.Get_2bit_Path()
+        stamp_cache = self.Get_File_Stamp(cache_path)
+        stamp_fasta = self.Get_File_Stamp()
+        if stamp_cache and stamp_cache[2] >= stamp_fasta[2]:
+            results = Read_2bit(cache_path)
+            if results: return results
+        # Pack
+        names = []
+        sequences = {}
+        f = FASTA_Reader()
+        f.Set_Seq_Format(SEQ_FORMAT.BYTES)
+        f.Set_Streaming(True)
+        f.Open(self.file_path)
+        while not f.End():
+            f.Read()
+            name = f.Get_Name()
+            seq = Packed_Sequence()
+            for chunk in f.Iterate_Seq(self._CONFIG__block_size):
+                seq.Append(chunk)
+            names.append(name)
+            sequences[name] = seq
+        f.Close()
+        if Write_2bit(cache_path, names, sequences):
+            self.printE(self._MSG__2bit_write_fail.format(PATH = cache_path))
+        return [names, sequences]
+    
+    
+    
     # File I/O Methods #########################################################
     
+    def Close(self):
+        """
+        Close the object's file, and the file handle used for random access, if
+        they are open.
+        """
+        if self.file_random:
+            self.file_random.close()
+            self.file_random = None
+        File_Reader.Close(self)
+    
     # File Reading Methods #####################################################
     
+    def Read_Header(self):
+        """
+        Reset the streaming buffers when a new file is opened. FASTA files do
+        not have headers.
+        """
+        self._reset_stream()
+    
     def _read(self):
         """
         Read in the next element.
@@ -128,19 +539,19 @@ class FASTA_Reader(File_Reader):
         files, are what the original File_Reader base class were designed to
         account for with its "next" buffer.
         """
+        if self.streaming: return self._read__STREAM()
         self.current_index += 1
         # Current seq
-        sb = ""
+        lines = []
         line = self.file.readline()
         while line and line[0] != ">":
-            if line[-1] in LIST__newline: line = line[:-1]
-            sb += line
+            lines.append(line.rstrip("\r\n"))
             line = self.file.readline()
         # Slide
-        self.next_element.append(sb)        
+        self.next_element.append(self._join_seq(lines))
         self.current_element = self.next_element
         # Next element
-        if line and line[-1] in LIST__newline: line = line[:-1]
+        line = line.rstrip("\r\n")
         if line:
             values = line.split(" ", 1)
             values[0] = values[0][1:]
@@ -150,6 +561,160 @@ class FASTA_Reader(File_Reader):
             self.EOF = True
             self.printP(self._MSG__EOF_reached)
     
+    def _read__STREAM(self):
+        """
+        Read in the next element, without its nucleotide sequence.
+        
+        The streaming version of _read(). Any unread part of the current
+        nucleotide sequence is skipped, and the name and annotation of the next
+        sequence, which were read when the end of the current sequence was
+        reached, become the "current" element. The nucleotide sequence of the
+        new "current" element is left unread.
+        """
+        while not self.stream_seq_done: self._fill_seq_stream(False)
+        if self.EOF: return
+        self.current_index += 1
+        if not self.stream_primed: # Reading anything before the first sequence
+            self.stream_primed = True
+            self.current_element = self.Copy_Element(self.empty_element)
+            return
+        self.current_element = self.next_element + [self._join_seq([])]
+        self.next_element = self.Copy_Element(self.empty_element)
+        self.stream_seq_done = False
+        self.stream_has_next = None
+    
+    def Read_Seq_Chunk(self, size):
+        """
+        Read and return the next [size] nucleotides of the current sequence when
+        streaming. Fewer nucleotides are returned if the end of the sequence is
+        reached.
+        
+        Return an empty sequence if the entire sequence has already been read.
+        """
+        lines = []
+        while size > 0:
+            if self.stream_seq_index >= len(self.stream_seq):
+                if self.stream_seq_done: break
+                self._fill_seq_stream()
+                continue
+            chunk = self.stream_seq[self.stream_seq_index:
+                    self.stream_seq_index + size]
+            self.stream_seq_index += len(chunk)
+            size -= len(chunk)
+            lines.append(chunk)
+        return self._join_seq(lines)
+    
+    def Iterate_Seq(self, size):
+        """
+        Iterate through the rest of the current sequence when streaming,
+        yielding chunks of [size] nucleotides. The final chunk may be shorter.
+        """
+        chunk = self.Read_Seq_Chunk(size)
+        while len(chunk):
+            yield chunk
+            chunk = self.Read_Seq_Chunk(size)
+    
+    def _reset_stream(self):
+        """
+        Reset the buffers and state indicators used for streaming.
+        """
+        self.stream_buffer = ""
+        self.stream_buffer_index = 0
+        self.stream_seq = ""
+        self.stream_seq_index = 0
+        self.stream_seq_done = False
+        self.stream_primed = False
+        self.stream_has_next = None
+    
+    def _fill_seq_stream(self, keep=True):
+        """
+        Move the next block of the current nucleotide sequence from the file
+        into the sequence buffer, with all newlines removed.
+        
+        If the end of the sequence is reached, the name and annotation of the
+        next sequence are read in as the "next" element. If the end of the file
+        is reached instead, the EOF flag is set.
+        
+        If [keep] is False, the block is skipped over instead.
+        """
+        self.stream_seq = ""
+        self.stream_seq_index = 0
+        if self.stream_buffer_index >= len(self.stream_buffer):
+            self.stream_buffer = self.file.read(self._CONFIG__block_size)
+            self.stream_buffer_index = 0
+        if not self.stream_buffer: # EOF
+            self.stream_seq_done = True
+            self.EOF = True
+            self.printP(self._MSG__EOF_reached)
+            return
+        start = self.stream_buffer_index
+        header = self.stream_buffer.find(">", start)
+        if header == -1: end = len(self.stream_buffer)
+        else: end = header
+        if keep:
+            raw = self.stream_buffer[start:end]
+            self.stream_seq = raw.replace("\n", "").replace("\r", "")
+        self.stream_buffer_index = end
+        if header != -1:
+            self.stream_seq_done = True
+            self._read_header_stream()
+    
+    def _peek_header_stream(self):
+        """
+        Return True if there is another sequence after the current one, looking
+        ahead through the streaming buffer and the file without moving the
+        reading position.
+        Return False otherwise.
+        """
+        if self.stream_buffer.find(">", self.stream_buffer_index) != -1:
+            return True
+        position = self.file.tell()
+        found = False
+        block = self.file.read(self._CONFIG__block_size)
+        while block:
+            if ">" in block:
+                found = True
+                break
+            block = self.file.read(self._CONFIG__block_size)
+        self.file.seek(position)
+        return found
+    
+    def _read_header_stream(self):
+        """
+        Read in the line at the start of the streaming buffer as the name and
+        annotation of the "next" element.
+        """
+        newline = self.stream_buffer.find("\n", self.stream_buffer_index)
+        while newline == -1:
+            block = self.file.read(self._CONFIG__block_size)
+            self.stream_buffer = (self.stream_buffer[self.stream_buffer_index:]
+                    + block)
+            self.stream_buffer_index = 0
+            if block: newline = self.stream_buffer.find("\n")
+            else: newline = len(self.stream_buffer)
+        line = self.stream_buffer[self.stream_buffer_index:newline]
+        self.stream_buffer_index = newline + 1
+        values = line.rstrip("\r\n").split(" ", 1)
+        values[0] = values[0][1:]
+        if len(values) == 1: values.append("")
+        self.next_element = values
+    
+    def _join_seq(self, lines):
+        """
+        Join the lines of a nucleotide sequence into a single sequence of the
+        current sequence format, with a single join rather than one
+        concatenation per line.
+        """
+        if self.seq_format == SEQ_FORMAT.BYTEARRAY:
+            return bytearray().join(lines)
+        if self.seq_format == SEQ_FORMAT.PACKED:
+            return Packed_Sequence("".join(lines))
+        if self.seq_format == SEQ_FORMAT.NUMPY:
+            return Seq_To_Array(bytearray().join(lines))
+        if self.seq_format == SEQ_FORMAT.BYTES:
+            return bytes().join(lines)
+        return "".join(lines)
+    
     def Is_Empty_Element(self, element):
         """
         Return True if [element] is an "empty" element.
@@ -157,7 +722,7 @@ class FASTA_Reader(File_Reader):
         Return False otherwise.
         """
         for s in element:
-            if s != "": return False
+            if len(s): return False
         return True
 
 
@@ -1,12 +1,18 @@
 """
 FILE READER
-(version 1.2)
+(version 1.3)
 by Angelo Chan
 
 This module contains a Class designed to be the base class on which
 type-specific file readers are to be based.
 """
 
+# Imported Modules #############################################################
+
+import os
+
+
+
 # Lists ########################################################################
 
 LIST__newline = ["\n", "\r", "\n\r", "\r\n"]
@@ -52,6 +58,8 @@ class File_Reader:
     _CONFIG__print_errors = True
     _CONFIG__print_progress = True
     _CONFIG__print_metrics = True
+    
+    _CONFIG__file_mode = "U" # The mode in which files are opened for reading
 
     # Strings ##################################################################
     
@@ -177,6 +185,25 @@ class File_Reader:
         if rightmost_period < rightmost_slash: return ""
         return file_path[rightmost_period+1:]
     
+    def Get_File_Stamp(self, file_path=""):
+        """
+        Return a tuple of the absolute file path, the file size, and the time of
+        last modification of the specified file. Use the stored file path if no
+        file path was specified.
+        
+        Results which are expensive to compute, such as file sizes, can be
+        cached using this tuple as the key, so that they are only recomputed if
+        the file changes.
+        
+        Return None if the file cannot be found.
+        """
+        if not file_path: file_path = self.file_path
+        try:
+            stats = os.stat(file_path)
+        except:
+            return None
+        return (os.path.abspath(file_path), stats.st_size, stats.st_mtime)
+    
     
     
     # File I/O Methods #########################################################
@@ -221,7 +248,7 @@ class File_Reader:
                 self.printE(self._MSG__open_file_fail)
             else:
                 if self.file_opened: self.Close()
-                self.file = open(self.file_path, "U")
+                self.file = open(self.file_path, self._CONFIG__file_mode)
                 self.__new()
                 self.printP(self._MSG__file_opened_message.format(
                         F=self.file_path))
@@ -1,10 +1,13 @@
 """
 GTF FILE READER
-(version 1.0)
+(version 1.3)
 by Angelo Chan
 
 This module contains a Class capable of reading and a GTF file and grouping the
 rows by some sort of criteria, such as by gene_ID.
+
+The tags in the 9th column are only parsed into a dictionary when they are
+first accessed. Grouping by tag only looks for the one tag.
 """
 
 # Configurations ###############################################################
@@ -18,6 +21,8 @@ STR__stop_codon = "stop_codon"
 
 from Table_File_Reader import * # Requires version 1.1 or later
 
+from UserDict import DictMixin
+
 
 
 # Enums ########################################################################
@@ -50,6 +55,70 @@ DICT__grouping_methods = {
 
 # Classes ######################################################################
 
+class GTF_Tags(DictMixin):
+    """
+    A dictionary of the tag:value pairs in the tags column (9th column) of a GTF
+    row, which is only parsed from the raw text when it is first accessed.
+    
+    Supports the same methods as a dictionary. Use dict(tags) to convert it
+    into a dictionary.
+    """
+    
+    def __init__(self, raw_str):
+        """
+        Create a GTF_Tags object from the raw text of the tags column.
+        """
+        self.raw = raw_str
+        self.tags = None
+    
+    def _get_tags(self):
+        """
+        Return the parsed dictionary, parsing the raw text if necessary.
+        """
+        if self.tags is None: self.tags = _parse_tags(self.raw)
+        return self.tags
+    
+    def __getitem__(self, key):
+        return self._get_tags()[key]
+    
+    def __setitem__(self, key, value):
+        self._get_tags()[key] = value
+    
+    def __delitem__(self, key):
+        del self._get_tags()[key]
+    
+    def __contains__(self, key):
+        return key in self._get_tags()
+    
+    def __iter__(self):
+        return iter(self._get_tags())
+    
+    def __len__(self):
+        return len(self._get_tags())
+    
+    def __repr__(self):
+        return repr(self._get_tags())
+    
+    def keys(self):
+        return self._get_tags().keys()
+    
+    def iteritems(self):
+        return self._get_tags().iteritems()
+    
+    def get(self, key, default=None):
+        return self._get_tags().get(key, default)
+    
+    def copy(self):
+        """
+        Return a copy. A copy of tags which have not been parsed yet is not
+        parsed either.
+        """
+        copy = GTF_Tags(self.raw)
+        if self.tags is not None: copy.tags = dict(self.tags)
+        return copy
+
+
+
 class GTF_Reader(Table_Reader):
     """
     The GTF Reader is a file reader designed specifically to faciliate working
@@ -63,6 +132,9 @@ class GTF_Reader(Table_Reader):
     strings correspond to the values in the 9 columns of the GTF file, while the
     dictionary is an easily accessible way to get information on the tags.
     
+    The dictionary is a GTF_Tags object, which is only parsed when it is first
+    accessed.
+    
     Additional functionality may be added in the future.
     
     Designed for the following use:
@@ -109,6 +181,8 @@ class GTF_Reader(Table_Reader):
     
     _MSG__abnormal = "Abnormal data detected:\n\t{s}"
     
+    _MSG__no_columns = "ERROR: The GTF Reader always returns all columns."
+    
     _MSG__unknown_ID_type = "SOFTWARE IMPLEMENTATION ERROR:\n\t"\
             "Attempted to use unknown ID type.\n\t"\
             "Please contact the developer."
@@ -136,6 +210,14 @@ class GTF_Reader(Table_Reader):
     
     # Property Methods #########################################################
     
+    def Set_Columns(self, indices):
+        """
+        GTF rows are always processed in full, so only an empty list of column
+        numbers, meaning all columns, is accepted.
+        """
+        if indices: self.printE(self._MSG__no_columns)
+        Table_Reader.Set_Columns(self, [])
+    
     def Set_Grouping_Method(self, grouping_method_str):
         """
         Set the grouping method the reader is to use.
@@ -267,11 +349,21 @@ class GTF_Reader(Table_Reader):
             for i in row:
                 if type(i) == str:
                     temp.append(i)
-                if type(i) == dict:
-                    temp.append(dict(i))
+                elif isinstance(i, (dict, GTF_Tags)):
+                    temp.append(i.copy())
             copy.append(temp)
         return copy
     
+    def Seek_Row(self, row_no):
+        """
+        Seeking to a row is not supported, as this reader returns groups of
+        rows.
+        
+        Return 3.
+        """
+        self.printE(self._MSG__seek_row_unsupported)
+        return 3
+    
     def Get_Size(self):
         """
         Return the number of lines of data in the file, excluding headers.
@@ -333,9 +425,11 @@ class GTF_Reader(Table_Reader):
                     line = self.file.readline()
         self.header_text = sb
         #
+        line = self._skip_filtered(line)
         values = self._process_raw(line)
         self.next_row = values
-        self.current_raw = self.file.readline()
+        if values != [""]: self.next_row_ID = self._get_group_ID(values)
+        self.current_raw = self._skip_filtered(self.file.readline())
     
     def _get_next_element(self):
         """
@@ -348,7 +442,7 @@ class GTF_Reader(Table_Reader):
         if row == [""]:
             self.Push_Next_ID(None)
             return self.empty_element
-        group_ID = self._get_group_ID(row)
+        group_ID = self.next_row_ID
         result = [list(row)]
         # Read on, loop
         flag = True
@@ -357,18 +451,20 @@ class GTF_Reader(Table_Reader):
             values = self._process_raw(self.current_raw)
             self.next_row = values
             # Check for EOF
-            if values and values != [""]:
+            ended = not values or values == [""]
+            if not ended:
                 ID = self._get_group_ID(values)
             else:
                 ID = None
             # Check for new section
-            if ID != group_ID:
+            if ended or ID != group_ID:
                 flag = False
+                self.next_row_ID = ID
                 self.Push_Next_ID(group_ID)
             else:
                 result.append(values)
             # Next
-            self.current_raw = self.file.readline()
+            self.current_raw = self._skip_filtered(self.file.readline())
         # Return
         return result
     
@@ -378,14 +474,16 @@ class GTF_Reader(Table_Reader):
         each of the columns and a dictionary of all the tag:value pairs in the
         9th column. The raw text from the 9th column is also included in the
         list of strings.
+        
+        The dictionary is a GTF_Tags object, which is only parsed when it is
+        first accessed.
         """
         results = Table_Reader._process_raw__SIMPLE(self, raw_str, "\t")
         if results == [""]: return results
         if len(results) < 9:
             self.printE(self._MSG__abnormal.format(s = raw_str))
             return [""]
-        tags_dict = self._parse_tags(results[8])
-        results.append(tags_dict)
+        results.append(GTF_Tags(results[8]))
         return results
         
     def _parse_tags(self, raw_str):
@@ -393,22 +491,7 @@ class GTF_Reader(Table_Reader):
         Parse the raw text from the tags column (9th column) and return the
         information as a field:value dictionary.
         """
-        # Setup
-        results = {}
-        # Parse
-        pairs = raw_str.split(";")
-        while "" in pairs: pairs.remove("") # CAN BE OPTIMIZED
-        if not pairs: return results
-        if pairs[-1][-1] in LIST__newline: pairs[-1] = pairs[-1][:-1]
-        for pair in pairs:
-            values = pair.split(" ")
-            while "" in values: values.remove("") # CAN BE OPTIMIZED
-            if len(values) > 1:
-                key, value = values
-                value = value.strip("\"")
-                results[key] = value
-        # Return
-        return results
+        return _parse_tags(raw_str)
     
     def _get_group_ID(self, values):
         """
@@ -417,10 +500,11 @@ class GTF_Reader(Table_Reader):
         should consist of a list of 9 strings and 1 dictionary.
         
         The method for getting the group ID will depend on the GTF Reader
-        settings.
+        settings. When grouping by tag, only the one tag is looked for in the
+        raw text of the 9th column, without parsing the other tags.
         """
         if self.grouping == METHOD.TAG:
-            return values[-1].get(self.tag, None)
+            return _get_tag(values[8], self.tag)
         raise Exception("CRITICAL ERROR: File reading somehow commenced "\
                 "without a grouping method set.")
     
@@ -487,3 +571,45 @@ class GTF_Reader(Table_Reader):
         return [chr_, lowest, highest, strand, length]
 
 
+
+# Functions ####################################################################
+
+def _parse_tags(raw_str):
+    """
+    Parse the raw text from the tags column (9th column) of a GTF file and
+    return the information as a field:value dictionary. If a field appears more
+    than once, the last value is used.
+    """
+    results = {}
+    for pair in raw_str.split(";"):
+        values = pair.split()
+        if len(values) > 1: results[values[0]] = _get_tag_value(values)
+    return results
+
+def _get_tag(raw_str, tag):
+    """
+    Return the value of [tag] in the raw text from the tags column (9th column)
+    of a GTF file, the same as _parse_tags would, but only parsing the pairs
+    which contain [tag].
+    
+    Return None if the tag is not found.
+    """
+    result = None
+    i = raw_str.find(tag)
+    while i != -1:
+        start = raw_str.rfind(";", 0, i) + 1
+        end = raw_str.find(";", i)
+        if end == -1: end = len(raw_str)
+        values = raw_str[start:end].split()
+        if len(values) > 1 and values[0] == tag:
+            result = _get_tag_value(values)
+        i = raw_str.find(tag, end)
+    return result
+
+def _get_tag_value(values):
+    """
+    Return the value of a tag:value pair, given the pair split at whitespace,
+    without any enclosing quotes. Values containing spaces are joined back up.
+    """
+    if len(values) == 2: return values[1].strip("\"")
+    return " ".join(values[1:]).strip("\"")
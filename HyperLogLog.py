@@ -0,0 +1,88 @@
+"""
+HYPERLOGLOG
+(version 1.0)
+by Angelo Chan
+
+This module contains a Class for estimating the number of distinct values in a
+collection of values, using a fixed amount of memory regardless of how many
+distinct values there are.
+
+The estimate has a standard error of about 1.04 / sqrt(2 ^ precision). With
+the default precision of 14, that is about 0.8%, using 16 KB of memory.
+"""
+
+# Imported Modules #############################################################
+
+import hashlib
+import math
+import struct
+
+
+
+# Classes ######################################################################
+
+class HyperLogLog():
+    """
+    A HyperLogLog counter, which estimates the number of distinct strings added
+    to it.
+    
+    Designed for the following use:
+    
+    h = HyperLogLog()
+    for value in values:
+        h.Add(value)
+    h.Merge(other) # Counters with the same precision can be combined
+    h.Estimate()
+    """
+    
+    # Constructor & Destructor #################################################
+    
+    def __init__(self, precision=14):
+        """
+        Create a HyperLogLog object with 2 ^ [precision] registers. [precision]
+        must be from 4 to 16.
+        """
+        if type(precision) != int or precision < 4 or precision > 16:
+            raise ValueError("precision must be an integer from 4 to 16")
+        self.precision = precision
+        self.size = 1 << precision
+        self.registers = bytearray(self.size)
+    
+    
+    
+    # Property Methods #########################################################
+    
+    def Add(self, value):
+        """
+        Add a string to the counter.
+        """
+        number = struct.unpack(">Q", hashlib.sha1(value).digest()[:8])[0]
+        bits = 64 - self.precision
+        i = number >> bits
+        rank = bits - (number & ((1 << bits) - 1)).bit_length() + 1
+        if rank > self.registers[i]: self.registers[i] = rank
+    
+    def Merge(self, other):
+        """
+        Combine the values counted by another HyperLogLog counter with the same
+        precision into this one.
+        """
+        if other.precision != self.precision:
+            raise ValueError("HyperLogLog precisions do not match")
+        self.registers = bytearray(map(max, self.registers, other.registers))
+    
+    def Estimate(self):
+        """
+        Return the estimated number of distinct values added, as an integer.
+        """
+        m = self.size
+        if m == 16: alpha = 0.673
+        elif m == 32: alpha = 0.697
+        elif m == 64: alpha = 0.709
+        else: alpha = 0.7213 / (1 + (1.079 / m))
+        total = sum([2.0 ** -i for i in self.registers])
+        estimate = alpha * m * m / total
+        zeros = self.registers.count("\x00")
+        if estimate <= 2.5 * m and zeros:
+            estimate = m * math.log(float(m) / zeros) # Linear counting
+        return int(round(estimate))
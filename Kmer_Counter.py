@@ -0,0 +1,364 @@
+"""
+K-MER COUNTER
+(version 1.1)
+by Angelo Chan
+
+This module contains a Class capable of counting the k-mers in nucleotide
+sequences, such as the sequences read by a FASTA_Reader, using vectorised
+array operations.
+
+K-mers are encoded as 2-bit integers, so k can be at most 31. K-mers containing
+Ns (or any other non-ACGT characters) are skipped. Counts are stored in a pair
+of sorted arrays, and the memory used is bounded and can be reported.
+
+Requires NumPy.
+"""
+
+# Imported Modules #############################################################
+
+from FASTA_File_Reader import *
+
+
+
+# Strings ######################################################################
+
+STR__kmer_bases = "ACGT" # The nucleotides represented by the codes 0, 1, 2, 3
+
+
+
+# Arrays #######################################################################
+
+if numpy is not None:
+    # Code of each character. (4 = Invalid)
+    ARRAY__kmer_codes = numpy.full(256, 4, dtype=numpy.uint8)
+    ARRAY__kmer_codes[bytearray("ACGTacgt")] = [0, 1, 2, 3, 0, 1, 2, 3]
+
+
+
+# Classes ######################################################################
+
+class Kmer_Counter():
+    """
+    The K-mer Counter counts the occurrences of every k-mer in a set of
+    nucleotide sequences.
+    
+    By default, k-mers are counted as canonical k-mers, meaning a k-mer and its
+    reverse complement are counted together, under whichever of the two has the
+    lower code.
+    
+    Designed for the following use:
+    
+    k = Kmer_Counter(21)
+    k.Count_File("F:/Filepath.fa")   # OR k.Count_Reader(f) OR k.Add_Seq(seq)
+    k.Get_Count("ACGTACGTACGTACGTACGTA")
+    for kmer, count in k.Iterate_Counts():
+        # Your code
+    k.Report()
+    
+    If a memory limit is set and the counts exceed it, the k-mers with the
+    lowest counts are discarded until the counts fit within the limit. The
+    counts are no longer exact once this has happened.
+    """
+    
+    # Minor Configurations #####################################################
+    
+    _CONFIG__print_errors = True
+    _CONFIG__print_metrics = True
+    
+    _CONFIG__batch_size = 4194304   # Number of k-mers buffered before merging
+    _CONFIG__segment_size = 4194304 # Number of nucleotides processed at once
+    
+    
+    
+    # Strings ##################################################################
+    
+    _MSG__invalid_k = "ERROR: Invalid k-mer size. Please specify an integer "\
+            "from 1 to 31."
+    
+    _MSG__pruned = "WARNING: The k-mer counts exceeded the memory limit. "\
+            "K-mers with a count of {C} or less have been discarded."
+    
+    _MSG__report = "K-mer size:       {K}\n"\
+            "Canonical:        {C}\n"\
+            "Total k-mers:     {T}\n"\
+            "Distinct k-mers:  {D}\n"\
+            "Discarded k-mers: {P}\n"\
+            "Memory used:      {M} bytes"
+    
+    
+    
+    # Constructor & Destructor #################################################
+    
+    def __init__(self, k=21, canonical=True, max_memory=0):
+        """
+        Create a K-mer Counter object for k-mers of size [k].
+        
+        [max_memory] is the maximum number of bytes to be used to store the
+        counts. There is no limit if it is 0.
+        """
+        if numpy is None: raise ImportError(STR__no_numpy)
+        if type(k) != int or k < 1 or k > 31: raise ValueError(
+                self._MSG__invalid_k)
+        self.k = k
+        self.canonical = canonical
+        self.max_memory = max_memory
+        self.Clear()
+    
+    
+    
+    # Property Methods #########################################################
+    
+    def Clear(self):
+        """
+        Discard all counts.
+        """
+        self.keys = numpy.zeros(0, dtype=numpy.uint64)
+        self.counts = numpy.zeros(0, dtype=numpy.uint64)
+        self.pending = []
+        self.pending_size = 0
+        self.total = 0
+        self.pruned = 0
+        self.prune_threshold = 0
+    
+    def Get_K(self):
+        """
+        Return the k-mer size.
+        """
+        return self.k
+    
+    def Is_Exact(self):
+        """
+        Return True if no k-mers have been discarded to stay within the memory
+        limit, and the counts are therefore exact.
+        Return False otherwise.
+        """
+        return self.pruned == 0
+    
+    def Get_Total(self):
+        """
+        Return the total number of k-mers counted.
+        """
+        return self.total
+    
+    def Get_Distinct(self):
+        """
+        Return the number of distinct k-mers counted.
+        """
+        self._merge()
+        return len(self.keys)
+    
+    def Get_Memory_Usage(self):
+        """
+        Return the number of bytes used to store the counts and the buffered
+        k-mers.
+        """
+        return self.keys.nbytes + self.counts.nbytes + (8 * self.pending_size)
+    
+    def Get_Counts(self):
+        """
+        Return the k-mer codes, in ascending order, and their counts, as a pair
+        of NumPy arrays.
+        """
+        self._merge()
+        return [self.keys, self.counts]
+    
+    def Get_Count(self, kmer):
+        """
+        Return the count of [kmer]. For canonical counts, the count of a k-mer
+        is the same as that of its reverse complement.
+        
+        Return 0 if [kmer] contains a non-ACGT character or is of the wrong
+        size.
+        """
+        codes = ARRAY__kmer_codes[Seq_To_Array(bytearray(kmer))]
+        if len(codes) != self.k or (codes == 4).any(): return 0
+        kmers = self._encode(codes)
+        self._merge()
+        i = numpy.searchsorted(self.keys, kmers[0])
+        if i < len(self.keys) and self.keys[i] == kmers[0]:
+            return int(self.counts[i])
+        return 0
+    
+    def Iterate_Counts(self):
+        """
+        Iterate through all the k-mers, in order of their codes, yielding each
+        k-mer as a string along with its count.
+        """
+        self._merge()
+        for code, count in zip(self.keys.tolist(), self.counts.tolist()):
+            yield (self.Decode_Kmer(code), count)
+    
+    def Decode_Kmer(self, code):
+        """
+        Return the k-mer string represented by [code].
+        """
+        code = int(code)
+        sb = []
+        for i in range(self.k):
+            sb.append(STR__kmer_bases[code & 3])
+            code >>= 2
+        return "".join(reversed(sb))
+    
+    def Report(self):
+        """
+        Print a summary of the counts, including the memory used.
+        """
+        self._merge()
+        self.printM(self._MSG__report.format(K = self.k, C = self.canonical,
+                T = self.total, D = len(self.keys), P = self.pruned,
+                M = self.Get_Memory_Usage()))
+    
+    
+    
+    # Counting Methods #########################################################
+    
+    def Count_File(self, file_path):
+        """
+        Count all the k-mers in all the sequences in a FASTA file.
+        
+        The sequences are streamed, so memory usage does not depend on the
+        length of the sequences.
+        """
+        f = FASTA_Reader()
+        f.Set_Seq_Format(SEQ_FORMAT.NUMPY)
+        f.Set_Streaming(True)
+        f.Open(file_path)
+        self.Count_Reader(f)
+        f.Close()
+    
+    def Count_Reader(self, reader):
+        """
+        Count all the k-mers in all the remaining sequences of an opened
+        FASTA_Reader. Streaming readers are read one chunk at a time.
+        """
+        while not reader.End():
+            reader.Read()
+            if reader.streaming:
+                # Overlap chunks by k-1 so no k-mers are lost between them
+                carry = None
+                for chunk in reader.Iterate_Seq(self._CONFIG__segment_size):
+                    chunk = self._to_array(chunk)
+                    if carry is not None:
+                        chunk = numpy.concatenate([carry, chunk])
+                    self.Add_Seq(chunk)
+                    carry = chunk[max(len(chunk) - self.k + 1, 0):]
+            else:
+                self.Add_Seq(reader.Get_Seq())
+    
+    def Add_Seq(self, seq):
+        """
+        Count all the k-mers in [seq], which may be a string, bytes, bytearray,
+        or NumPy array of unsigned 8-bit integers.
+        
+        Long sequences are processed a segment at a time, to bound the size of
+        the temporary arrays used.
+        """
+        seq = self._to_array(seq)
+        step = self._CONFIG__segment_size
+        start = 0
+        while start + self.k <= len(seq):
+            self._add_segment(seq[start:start + step + self.k - 1])
+            start += step
+    
+    def _to_array(self, seq):
+        """
+        Return [seq] as a NumPy array of unsigned 8-bit integers.
+        """
+        if isinstance(seq, numpy.ndarray): return seq
+        if isinstance(seq, Packed_Sequence): seq = seq.Decode()
+        return Seq_To_Array(bytes(seq))
+    
+    def _add_segment(self, seq):
+        """
+        Count all the k-mers in a segment of a sequence.
+        """
+        codes = ARRAY__kmer_codes[seq]
+        invalid = numpy.zeros(len(codes) + 1, dtype=numpy.int64)
+        numpy.cumsum(codes == 4, out=invalid[1:])
+        valid = (invalid[self.k:] - invalid[:-self.k]) == 0
+        kmers = self._encode(codes & 3)[valid]
+        if not len(kmers): return
+        self.total += len(kmers)
+        self.pending.append(kmers)
+        self.pending_size += len(kmers)
+        if self.pending_size >= self._CONFIG__batch_size: self._merge()
+    
+    def _encode(self, codes):
+        """
+        Return the codes of all the k-mers in an array of nucleotide codes, as
+        an array of unsigned 64-bit integers. The k-mers are canonical if the
+        counter is set to count canonical k-mers.
+        """
+        k = self.k
+        size = len(codes) - k + 1
+        codes = codes.astype(numpy.uint64)
+        kmers = numpy.zeros(size, dtype=numpy.uint64)
+        for i in range(k):
+            kmers <<= numpy.uint64(2)
+            kmers |= codes[i:i + size]
+        if not self.canonical: return kmers
+        reverse = numpy.zeros(size, dtype=numpy.uint64)
+        for i in range(k):
+            reverse |= ((numpy.uint64(3) - codes[i:i + size]) <<
+                    numpy.uint64(2 * i))
+        return numpy.minimum(kmers, reverse)
+    
+    def _merge(self):
+        """
+        Merge the buffered k-mers into the sorted arrays of counts, and enforce
+        the memory limit.
+        
+        Only the buffered k-mers are sorted. They are merged into the existing
+        arrays by binary search, without sorting the existing arrays again.
+        """
+        if not self.pending: return
+        kmers, counts = numpy.unique(numpy.concatenate(self.pending),
+                return_counts=True)
+        self.pending = []
+        self.pending_size = 0
+        # Insert the new k-mers in place, with counts of 0, then add the counts
+        indices = numpy.searchsorted(self.keys, kmers)
+        found = indices < len(self.keys)
+        found[found] = self.keys[indices[found]] == kmers[found]
+        new = ~found
+        self.keys = numpy.insert(self.keys, indices[new], kmers[new])
+        self.counts = numpy.insert(self.counts, indices[new],
+                numpy.zeros(1, dtype=numpy.uint64))
+        self.counts[numpy.searchsorted(self.keys, kmers)] += counts.astype(
+                numpy.uint64)
+        if self.max_memory: self._prune()
+    
+    def _prune(self):
+        """
+        Discard the k-mers with the lowest counts until the counts fit within
+        the memory limit.
+        """
+        threshold = self.prune_threshold
+        while (self.keys.nbytes + self.counts.nbytes > self.max_memory and
+                len(self.keys)):
+            threshold += 1
+            keep = self.counts > threshold
+            self.pruned += int(len(keep) - numpy.count_nonzero(keep))
+            self.keys = self.keys[keep]
+            self.counts = self.counts[keep]
+        if threshold != self.prune_threshold:
+            self.prune_threshold = threshold
+            self.printE(self._MSG__pruned.format(C = threshold))
+    
+    
+    
+    # Controlled Print Methods #################################################
+    
+    def printE(self, string):
+        """
+        Print the given string if the class variable for printing error
+        messages is set to True.
+        """
+        if self._CONFIG__print_errors: print(string)
+    
+    def printM(self, string):
+        """
+        Print the given string if the class variable for printing metrics
+        reports is set to True.
+        """
+        if self._CONFIG__print_metrics: print(string)
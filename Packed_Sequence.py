@@ -0,0 +1,390 @@
+"""
+PACKED SEQUENCE
+(version 1.0)
+by Angelo Chan
+
+This module contains a Class for storing nucleotide sequences in a compact
+2-bit format, as well as functions for reading and writing UCSC .2bit files.
+
+Each nucleotide is stored using 2 bits. Runs of Ns (and any other non-ACGT
+characters) and runs of lowercase (soft-masked) nucleotides are stored
+separately as lists of blocks, the same way they are stored in .2bit files.
+Sequences are only decoded into strings on demand.
+"""
+
+# Imported Modules #############################################################
+
+import binascii
+import bisect
+import re
+import struct
+
+
+
+# Integers #####################################################################
+
+INT__2bit_signature = 0x1A412743
+
+
+
+# Strings ######################################################################
+
+STR__2bit_bases = "TCAG" # The nucleotides represented by the codes 0, 1, 2, 3
+
+# Translates nucleotides into their codes, written as base-4 digits
+BYTES__encode = bytes(bytearray(
+        [ord(str(max(STR__2bit_bases.find(chr(i).upper()), 0)))
+        for i in range(256)]))
+
+
+
+# Lists ########################################################################
+
+# Translate packed bytes into their 1st, 2nd, 3rd, and 4th nucleotides
+LIST__decode = [bytes(bytearray(
+        [ord(STR__2bit_bases[(i >> (6 - (2 * k))) & 3]) for i in range(256)]))
+        for k in range(4)]
+
+
+
+# Regular Expressions ##########################################################
+
+REGEX__N_block = re.compile("[^ACGTacgt]+")
+REGEX__mask_block = re.compile("[a-z]+")
+
+
+
+# Classes ######################################################################
+
+class Packed_Sequence():
+    """
+    A nucleotide sequence stored in a 2-bit format.
+    
+    Designed for the following use:
+    
+    p = Packed_Sequence("ACGTNNNNacgt")
+    p.Append("ACGT")  # Sequences can be built up a piece at a time
+    len(p)            # 16
+    p.Decode(2, 6)    # "GTNN"
+    p[8:12]           # "acgt"
+    
+    Any character other than A, C, G, or T is stored as an N.
+    """
+    
+    # Constructor & Destructor #################################################
+    
+    def __init__(self, seq=""):
+        """
+        Create a Packed Sequence object, optionally starting with [seq].
+        """
+        self.size = 0
+        self.packed = bytearray()
+        self.pending = "" # Codes which do not yet fill a byte
+        self.n_starts = []
+        self.n_sizes = []
+        self.mask_starts = []
+        self.mask_sizes = []
+        if seq: self.Append(seq)
+    
+    
+    
+    # Property Methods #########################################################
+    
+    def __len__(self):
+        """
+        Return the number of nucleotides in the sequence.
+        """
+        return self.size
+    
+    def __getitem__(self, arg):
+        """
+        Return part of the sequence, decoded into a string, using square
+        brackets the same way one would slice a string.
+        """
+        if type(arg) == slice:
+            start, end, step = arg.indices(self.size)
+            if step == 1: return self.Decode(start, end)
+            return self.Decode()[start:end:step]
+        if arg < 0: arg += self.size
+        if arg < 0 or arg >= self.size:
+            raise IndexError("sequence index out of range")
+        return self.Decode(arg, arg + 1)
+    
+    def Get_N_Blocks(self):
+        """
+        Return the start positions and sizes of all the runs of Ns, as a list of
+        pairs.
+        """
+        return [list(i) for i in zip(self.n_starts, self.n_sizes)]
+    
+    def Get_Mask_Blocks(self):
+        """
+        Return the start positions and sizes of all the runs of lowercase
+        (soft-masked) nucleotides, as a list of pairs.
+        """
+        return [list(i) for i in zip(self.mask_starts, self.mask_sizes)]
+    
+    def Get_Packed_Bytes(self):
+        """
+        Return the packed nucleotides, including the final, partially filled
+        byte, as a bytearray.
+        """
+        return self.packed + self._pack_pending()
+    
+    def Get_Memory_Size(self):
+        """
+        Return the approximate number of bytes used to store the sequence.
+        """
+        return (len(self.packed) + len(self.pending) +
+                (4 * (len(self.n_starts) + len(self.mask_starts)) * 2))
+    
+    def Copy(self):
+        """
+        Return a copy of this sequence.
+        """
+        copy = Packed_Sequence()
+        copy.size = self.size
+        copy.packed = bytearray(self.packed)
+        copy.pending = self.pending
+        copy.n_starts = list(self.n_starts)
+        copy.n_sizes = list(self.n_sizes)
+        copy.mask_starts = list(self.mask_starts)
+        copy.mask_sizes = list(self.mask_sizes)
+        return copy
+    
+    
+    
+    # Encoding Methods #########################################################
+    
+    def Append(self, seq):
+        """
+        Add [seq] to the end of the sequence.
+        """
+        if type(seq) != str: seq = bytes(seq)
+        self._add_blocks(self.n_starts, self.n_sizes, REGEX__N_block, seq)
+        self._add_blocks(self.mask_starts, self.mask_sizes, REGEX__mask_block,
+                seq)
+        digits = self.pending + seq.translate(BYTES__encode)
+        full = len(digits) - (len(digits) % 4)
+        if full: self.packed += self._pack_digits(digits[:full])
+        self.pending = digits[full:]
+        self.size += len(seq)
+    
+    def Load(self, size, packed, n_blocks=[], mask_blocks=[]):
+        """
+        Replace the sequence with [size] nucleotides of already packed data,
+        such as from a .2bit file.
+        
+        [n_blocks] and [mask_blocks] are lists of start position and size pairs.
+        """
+        self.size = size
+        full = size // 4
+        self.packed = bytearray(packed[:full])
+        self.pending = ""
+        if size % 4:
+            byte = bytearray(packed[full:full + 1])[0]
+            for k in range(size % 4):
+                self.pending += str((byte >> (6 - (2 * k))) & 3)
+        self.n_starts = [i[0] for i in n_blocks]
+        self.n_sizes = [i[1] for i in n_blocks]
+        self.mask_starts = [i[0] for i in mask_blocks]
+        self.mask_sizes = [i[1] for i in mask_blocks]
+    
+    def _add_blocks(self, starts, sizes, regex, seq):
+        """
+        Record the runs of characters in [seq] which match [regex] as blocks,
+        merging them with the last block if they are contiguous.
+        """
+        for match in regex.finditer(seq):
+            start = self.size + match.start()
+            size = match.end() - match.start()
+            if starts and starts[-1] + sizes[-1] == start:
+                sizes[-1] += size
+            else:
+                starts.append(start)
+                sizes.append(size)
+    
+    def _pack_digits(self, digits):
+        """
+        Pack a string of base-4 digits, whose length is a multiple of 4, into a
+        bytearray.
+        
+        Every 4 digits make up exactly 1 byte, so the entire string can be
+        converted in bulk by reading it as a single base-4 number and writing
+        that number out in hexadecimal.
+        """
+        number = int(digits, 4)
+        hex_str = "%0*x" % (len(digits) // 2, number)
+        return bytearray(binascii.unhexlify(hex_str))
+    
+    def _pack_pending(self):
+        """
+        Return the pending codes packed into a single byte, padded with zeroes,
+        or an empty bytearray if there are no pending codes.
+        """
+        if not self.pending: return bytearray()
+        return self._pack_digits(self.pending + "000"[len(self.pending) - 1:])
+    
+    
+    
+    # Decoding Methods #########################################################
+    
+    def Decode(self, start=0, end=None):
+        """
+        Return the nucleotide sequence from [start] to [end] as a string.
+        
+        Uses a 0-index system, and the end coordinate is exclusive.
+        """
+        if end == None or end > self.size: end = self.size
+        if start < 0: start = 0
+        if end <= start: return ""
+        byte_start = start // 4
+        byte_end = (end + 3) // 4
+        data = self.packed[byte_start:byte_end]
+        if byte_end > len(self.packed): data += self._pack_pending()
+        result = bytearray(4 * len(data))
+        for k in range(4):
+            result[k::4] = data.translate(LIST__decode[k])
+        offset = byte_start * 4
+        result = result[start - offset:end - offset]
+        for s, e in self._get_blocks(self.n_starts, self.n_sizes, start, end):
+            result[s - start:e - start] = "N" * (e - s)
+        for s, e in self._get_blocks(self.mask_starts, self.mask_sizes, start,
+                end):
+            result[s - start:e - start] = result[s - start:e - start].lower()
+        return bytes(result)
+    
+    def _get_blocks(self, starts, sizes, start, end):
+        """
+        Return the parts of the blocks which overlap the range from [start] to
+        [end], as a list of start and end pairs.
+        """
+        results = []
+        i = max(bisect.bisect_right(starts, start) - 1, 0)
+        while i < len(starts) and starts[i] < end:
+            s = max(starts[i], start)
+            e = min(starts[i] + sizes[i], end)
+            if e > s: results.append([s, e])
+            i += 1
+        return results
+
+
+
+# Functions ####################################################################
+
+def Write_2bit(file_path, names, sequences):
+    """
+    Write packed sequences to a UCSC .2bit file.
+    
+    @file_path
+            (str - filepath)
+            The file path of the .2bit file to be written.
+    @names
+            (list<str>)
+            The names of the sequences, in the order they are to be written.
+    @sequences
+            (dict<str:Packed_Sequence>)
+            The packed sequences, with their names as keys.
+    
+    Return 0 if successful.
+    Return 1 if the file could not be written.
+    
+    Write_2bit(str, list<str>, dict<str:Packed_Sequence>) -> int
+    """
+    try:
+        o = open(file_path, "wb")
+    except:
+        return 1
+    o.write(struct.pack("<IIII", INT__2bit_signature, 0, len(names), 0))
+    # Index
+    offset = 16 + sum([5 + len(name) for name in names])
+    for name in names:
+        seq = sequences[name]
+        o.write(struct.pack("<B", len(name)) + name.encode("ascii") +
+                struct.pack("<I", offset))
+        offset += (16 + (8 * (len(seq.n_starts) + len(seq.mask_starts))) +
+                ((seq.size + 3) // 4))
+    # Sequences
+    for name in names:
+        seq = sequences[name]
+        o.write(struct.pack("<II", seq.size, len(seq.n_starts)))
+        o.write(_pack_uints(seq.n_starts) + _pack_uints(seq.n_sizes))
+        o.write(struct.pack("<I", len(seq.mask_starts)))
+        o.write(_pack_uints(seq.mask_starts) + _pack_uints(seq.mask_sizes))
+        o.write(struct.pack("<I", 0))
+        o.write(bytes(seq.Get_Packed_Bytes()))
+    o.close()
+    return 0
+
+def Read_2bit(file_path, names=None):
+    """
+    Read packed sequences from a UCSC .2bit file.
+    
+    @file_path
+            (str - filepath)
+            The file path of the .2bit file to be read.
+    @names
+            (list<str>)
+            The names of the sequences to be read. All sequences are read if no
+            names are specified.
+    
+    Return a list of the names of the sequences read, in the order they appear
+    in the file, and a dictionary of the packed sequences.
+    Return None if the file is not a valid .2bit file.
+    
+    Read_2bit(str, list<str>) -> [list<str>, dict<str:Packed_Sequence>]
+    """
+    f = open(file_path, "rb")
+    # Header
+    header = f.read(16)
+    if len(header) < 16:
+        f.close()
+        return None
+    endian = "<"
+    if struct.unpack("<I", header[:4])[0] != INT__2bit_signature:
+        endian = ">"
+        if struct.unpack(">I", header[:4])[0] != INT__2bit_signature:
+            f.close()
+            return None
+    count = struct.unpack(endian + "I", header[8:12])[0]
+    # Index
+    index = []
+    for i in range(count):
+        size = struct.unpack("B", f.read(1))[0]
+        name = f.read(size).decode("ascii")
+        offset = struct.unpack(endian + "I", f.read(4))[0]
+        index.append([str(name), offset])
+    # Sequences
+    if names != None: names = set(names)
+    results_names = []
+    results = {}
+    for name, offset in index:
+        if names != None and name not in names: continue
+        f.seek(offset)
+        size, n_count = struct.unpack(endian + "II", f.read(8))
+        n_starts = _unpack_uints(f, n_count, endian)
+        n_sizes = _unpack_uints(f, n_count, endian)
+        mask_count = struct.unpack(endian + "I", f.read(4))[0]
+        mask_starts = _unpack_uints(f, mask_count, endian)
+        mask_sizes = _unpack_uints(f, mask_count, endian)
+        f.read(4) # Reserved
+        seq = Packed_Sequence()
+        seq.Load(size, f.read((size + 3) // 4), zip(n_starts, n_sizes),
+                zip(mask_starts, mask_sizes))
+        results_names.append(name)
+        results[name] = seq
+    f.close()
+    return [results_names, results]
+
+def _pack_uints(values):
+    """
+    Pack a list of integers as little-endian 32-bit unsigned integers.
+    """
+    return struct.pack("<%dI" % len(values), *values)
+
+def _unpack_uints(f, number, endian):
+    """
+    Read [number] 32-bit unsigned integers from file [f] and return them as a
+    list.
+    """
+    return list(struct.unpack(endian + "%dI" % number, f.read(4 * number)))
@@ -0,0 +1,128 @@
+"""
+SEQUENCE ARRAY
+(version 1.0)
+by Angelo Chan
+
+This module contains functions for working with nucleotide sequences stored as
+NumPy arrays of unsigned 8-bit integers, with one ASCII character code per
+nucleotide. All operations are vectorised and do not go through Python strings.
+
+Requires NumPy.
+"""
+
+# Imported Modules #############################################################
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+
+# Strings ######################################################################
+
+STR__complement_from = "ACGTNRYKMBVDHSWacgtnrykmbvdhsw"
+STR__complement_to   = "TGCANYRMKVBHDSWtgcanyrmkvbhdsw"
+
+STR__no_numpy = "NumPy is required for sequence arrays but is not installed."
+
+
+
+# Arrays #######################################################################
+
+if numpy is not None:
+    # Complement of each character code. Unknown characters are unchanged.
+    ARRAY__complement = numpy.arange(256, dtype=numpy.uint8)
+    ARRAY__complement[bytearray(STR__complement_from)] = bytearray(
+            STR__complement_to)
+    # Column of each character code in a one-hot array. (4 = No column)
+    ARRAY__one_hot_column = numpy.full(256, 4, dtype=numpy.uint8)
+    ARRAY__one_hot_column[bytearray("ACGTacgt")] = [0, 1, 2, 3, 0, 1, 2, 3]
+    ARRAY__one_hot = numpy.eye(5, 4, dtype=numpy.uint8)
+
+
+
+# Functions ####################################################################
+
+def Seq_To_Array(seq):
+    """
+    Return a nucleotide sequence as a NumPy array of unsigned 8-bit integers,
+    without copying it.
+    
+    @seq
+            (str/bytes/bytearray)
+            The nucleotide sequence. The array will be read-only unless [seq] is
+            a bytearray.
+    
+    Seq_To_Array(str) -> numpy.ndarray<uint8>
+    """
+    _check_numpy()
+    return numpy.frombuffer(seq, dtype=numpy.uint8)
+
+def Array_To_Seq(array):
+    """
+    Return a nucleotide sequence array as a string.
+    
+    Array_To_Seq(numpy.ndarray<uint8>) -> str
+    """
+    _check_numpy()
+    return array.tobytes()
+
+def Reverse_Complement(array):
+    """
+    Return the reverse complement of a nucleotide sequence array as a new array.
+    IUPAC ambiguity codes are complemented, and case is preserved.
+    
+    Reverse_Complement(numpy.ndarray<uint8>) -> numpy.ndarray<uint8>
+    """
+    _check_numpy()
+    return ARRAY__complement[array[::-1]]
+
+def Base_Composition(array):
+    """
+    Return the number of As, Cs, Gs, Ts, and Ns in a nucleotide sequence array,
+    as well as the number of other characters, as a dictionary. Uppercase and
+    lowercase nucleotides are counted together.
+    
+    Base_Composition(numpy.ndarray<uint8>) -> dict<str:int>
+    """
+    _check_numpy()
+    counts = numpy.bincount(array, minlength=256)
+    results = {}
+    total = 0
+    for base in "ACGTN":
+        count = int(counts[ord(base)] + counts[ord(base.lower())])
+        results[base] = count
+        total += count
+    results["other"] = len(array) - total
+    return results
+
+def N_Fraction(array):
+    """
+    Return the fraction of a nucleotide sequence array which consists of Ns.
+    
+    Return 0.0 if the array is empty.
+    
+    N_Fraction(numpy.ndarray<uint8>) -> float
+    """
+    _check_numpy()
+    if not len(array): return 0.0
+    count = numpy.count_nonzero((array == ord("N")) | (array == ord("n")))
+    return float(count) / len(array)
+
+def One_Hot(array):
+    """
+    Return a nucleotide sequence array as a one-hot encoded array, with one row
+    per nucleotide and one column each for A, C, G, and T, in that order. Rows
+    for Ns and other characters are all zeroes.
+    
+    One_Hot(numpy.ndarray<uint8>) -> numpy.ndarray<uint8>
+    """
+    _check_numpy()
+    return ARRAY__one_hot[ARRAY__one_hot_column[array]]
+
+def _check_numpy():
+    """
+    Raise an ImportError if NumPy is not installed.
+    """
+    if numpy is None: raise ImportError(STR__no_numpy)
@@ -0,0 +1,93 @@
+"""
+SORTED RUNS
+(version 1.0)
+by Angelo Chan
+
+This module contains functions for sorting more rows than fit in memory at once,
+by sorting them in batches, writing each batch to a temporary file as a sorted
+run, and then merging the runs.
+
+Used by the Table File Sorter and by Table_Reader's key index.
+"""
+
+# Imported Modules #############################################################
+
+import heapq
+import tempfile
+
+
+
+# Integers #####################################################################
+
+INT__row_overhead = 200 # Approximate memory used per row, in addition to text
+
+
+
+# Functions ####################################################################
+
+def Write_Run(batch, temp_dir=""):
+    """
+    Sort a batch of rows by their keys and write the rows to a temporary file.
+    
+    @batch
+            (list<(key, str)>)
+            The rows to be sorted, each paired with its sort key. The rows
+            should end in a newline.
+    @temp_dir
+            (str - dirpath)
+            The directory for the temporary file. The system default is used if
+            no directory is specified.
+    
+    Return the temporary file, rewound to the start.
+    
+    Write_Run(list<(key, str)>, str) -> file
+    """
+    batch.sort(key = Get_First)
+    if temp_dir: run = tempfile.TemporaryFile(dir = temp_dir)
+    else: run = tempfile.TemporaryFile()
+    run.write("".join([row for key, row in batch]))
+    run.seek(0)
+    return run
+
+def Merge_Runs(runs, o, get_key):
+    """
+    Merge sorted runs of rows into output file [o], using a heap which holds one
+    row from each run.
+    
+    @runs
+            (list<file>)
+            The sorted runs, as returned by Write_Run. All the runs are closed
+            afterwards.
+    @o
+            (file)
+            The file the merged rows are written to.
+    @get_key
+            (function)
+            A function which returns the sort key of a row read back from a
+            run.
+    
+    Ties are broken by run number, so that the merge is stable.
+    
+    Merge_Runs(list<file>, file, function) -> None
+    """
+    heap = []
+    for run_no, run in enumerate(runs):
+        row = run.readline()
+        if row: heap.append([get_key(row), run_no, row])
+    heapq.heapify(heap)
+    while heap:
+        key, run_no, row = heap[0]
+        o.write(row)
+        row = runs[run_no].readline()
+        if row: heapq.heapreplace(heap, [get_key(row), run_no, row])
+        else: heapq.heappop(heap)
+    for run in runs: run.close()
+
+def Get_First(pair):
+    """
+    Return the first item of [pair]. Used as the key for sorting batches of
+    (key, row) pairs.
+    
+    Get_First(list/tuple) -> object
+    """
+    return pair[0]
@@ -1,6 +1,6 @@
 """
 SUBGROUPED TABLE FILE READER
-(version 1.0)
+(version 1.10)
 by Angelo Chan
 
 This module contains a Class capable of reading and a data table file whose
@@ -24,11 +24,35 @@ Example yields:
 
     What the reader returns after the second read:
         [["4", "Ore", "Copper"], ["5", "Ore", "Tin"], ["6", "Ore", "Iron"]] 
+
+In streaming mode, the rows of each group are instead read from the file one at
+a time, as they are iterated over, so that memory usage does not depend on the
+size of the groups.
+
+Groups can also be processed in parallel, by a pool of processes.
+
+Files which are not sorted by group can be read in unsorted mode, in which the
+rows are grouped in memory, or partitioned into temporary files by a hash of
+their group IDs if they do not fit within a memory limit.
 """
 
 # Imported Modules #############################################################
 
 from Table_File_Reader import *
+from Table_File_Reader import _imap_bounded
+
+from Sorted_Runs import INT__row_overhead
+
+import tempfile
+import time
+import traceback
+import zlib
+
+
+
+# Integers #####################################################################
+
+INT__max_partitions = 1024 # Maximum number of partition files in unsorted mode
 
 
 
@@ -61,6 +85,7 @@ class Subgrouped_Table_Reader(Table_Reader):
     f.Set_Group_ID_Column_No(0)
     f.Set_Enclosers(["\"", "'"])  # Optional
     f.Set_Keep_Enclosers(True)    # Optional
+    f.Set_Columns([0, 3])         # Optional - Only return these columns
     f.Set_Header_Params(["#", 1]) # Optional
     #                               Skip:
     #                                   all rows starting with "#", THEN
@@ -73,6 +98,36 @@ class Subgrouped_Table_Reader(Table_Reader):
         f.Read()
         # Your code - You may access buffered elements in f
     f.Close()
+    
+    To apply a function to every group using multiple processes:
+    
+    f.Open()
+    for result in f.Map_Groups(func, 4):
+        # Your code
+    f.Close()
+    
+    If only some columns are to be returned and the group ID column is not one
+    of them, the group ID column is returned after them.
+    
+    For very large groups, streaming mode returns the rows of each group one at
+    a time instead:
+    
+    f.Set_Streaming(True)
+    f.Open()
+    while not f.End():
+        f.Read()
+        group_ID = f.Get_Group_ID()
+        for row in f.Iterate_Group():
+            # Your code
+        # OR f.Skip_Group()
+    f.Close()
+    
+    Any rows of a group which were not iterated over are skipped by the next
+    Read(), extracting only their group IDs.
+    
+    For files which are not sorted by group ID, call f.Set_Unsorted(True) before
+    opening the file. Every group is then returned whole, but the groups are
+    not returned in the order they appear in the file.
     """
     
     # Minor Configurations #####################################################
@@ -85,6 +140,9 @@ class Subgrouped_Table_Reader(Table_Reader):
     _CONFIG__print_progress = False
     _CONFIG__print_metrics = True
     
+    _CONFIG__unsorted_memory = 268435456 # Default memory limit, in bytes, for
+    #                                      unsorted mode
+    
     
     
     # Strings ##################################################################
@@ -97,6 +155,17 @@ class Subgrouped_Table_Reader(Table_Reader):
     _MSG__no_col_group_ID = "No column number has been specified as containing"\
             " the group IDs."
     
+    _MSG__map_fail = "Function failed on group {N}:\n{E}"
+    
+    _MSG__map_pool_fail = "Groups could not be passed to or from the "\
+            "processes:\n{E}"
+    
+    _MSG__map_report = "Groups processed: {G}\n"\
+            "Time taken:       {T:.3f} seconds\n"\
+            "Throughput:       {R:.1f} groups per second\n"\
+            "Mean latency:     {L:.4f} seconds\n"\
+            "Max latency:      {M:.4f} seconds"
+    
     
     
     # Constructor & Destructor #################################################
@@ -108,6 +177,21 @@ class Subgrouped_Table_Reader(Table_Reader):
         Creates a Subgrouped File Reader object. The filepath will be tested if
         a filepath is supplied.
         """
+        self.group_ID_column = -1
+        self.requested_columns = []
+        self.group_count = None
+        self.streaming = False
+        self.streaming_active = False
+        self.group_primed = False
+        self.group_unread = False
+        self.group_has_next = None
+        self.group_ID = ""
+        self.map_metrics = {}
+        self.unsorted = False
+        self.unsorted_memory = self._CONFIG__unsorted_memory
+        self.unsorted_temp_dir = ""
+        self.unsorted_active = False
+        self.unsorted_groups = None
         Table_Reader.__init__(self, file_path, auto_open, delimiter,
                 enclosers, header_params, keep_enclosers)
         if group_ID_column != -1:
@@ -132,8 +216,10 @@ class Subgrouped_Table_Reader(Table_Reader):
         except:
             self.group_ID_column = -1
             self.printE(self._MSG__invalid_col_group_ID)
+            self._update_columns()
             return
         self.group_ID_column = col_no
+        self._update_columns()
 
     def Get_Group_ID_Column_No(self):
         """
@@ -141,6 +227,111 @@ class Subgrouped_Table_Reader(Table_Reader):
         """
         return self.group_ID_column
     
+    def Set_Columns(self, indices):
+        """
+        Set the column numbers of the only columns to be returned, in the order
+        they are to be returned. The group ID column is added after them if it
+        is not one of them.
+        
+        All columns are returned if [indices] is empty.
+        
+        Uses a 0-index system. (The first column is column 0)
+        """
+        self.requested_columns = list(indices)
+        self._update_columns()
+    
+    def Get_Columns(self):
+        """
+        Return the column numbers of the only columns to be returned, as
+        originally specified.
+        
+        Return an empty list if all columns are to be returned.
+        """
+        return list(self.requested_columns)
+    
+    def Set_Streaming(self, boolean):
+        """
+        Set whether or not the rows of each group are to be streamed from the
+        file one at a time, rather than all read into memory at once. Takes
+        effect the next time a file is opened.
+        """
+        self.streaming = bool(boolean)
+    
+    def Get_Streaming(self):
+        """
+        Return whether or not streaming mode is set.
+        """
+        return self.streaming
+    
+    def Set_Unsorted(self, boolean, max_memory=0, temp_dir=""):
+        """
+        Set whether or not the file is to be read in unsorted mode, for files
+        which are not sorted by group ID. Takes effect the next time a file is
+        opened.
+        
+        In unsorted mode, the rows are grouped by group ID in memory when the
+        file is opened. If the rows do not fit within [max_memory] bytes, they
+        are instead partitioned into temporary files in [temp_dir] by a hash of
+        their group IDs, and the groups are formed one partition at a time.
+        
+        Within each partition, groups are returned in the order their first rows
+        appear, with their rows in file order. Partitions are not guaranteed to
+        fit within [max_memory] if a few groups hold most of the rows.
+        
+        Streaming mode is not available in unsorted mode.
+        """
+        self.unsorted = bool(boolean)
+        if max_memory: self.unsorted_memory = max_memory
+        else: self.unsorted_memory = self._CONFIG__unsorted_memory
+        self.unsorted_temp_dir = temp_dir
+    
+    def Get_Unsorted(self):
+        """
+        Return whether or not unsorted mode is set.
+        """
+        return self.unsorted
+    
+    def Get_Group_ID(self):
+        """
+        Return the group ID of the current group.
+        
+        Return an empty string if no group has been read yet.
+        """
+        if self.streaming_active: return self.group_ID
+        if not self.current_element or self.current_element == [[""]]:
+            return ""
+        return self.current_element[0][self.group_index]
+    
+    def Get_Map_Metrics(self):
+        """
+        Return the metrics of the last call to Map_Groups, as a dictionary of:
+            groups - The number of groups processed
+            seconds - The time taken, in seconds
+            throughput - The number of groups processed per second
+            mean_latency - The mean time, in seconds, between a group being
+                    sent to a process and its result being ready
+            max_latency - The longest such time, in seconds
+        
+        Return an empty dictionary if Map_Groups has not finished yet.
+        """
+        return dict(self.map_metrics)
+    
+    def _update_columns(self):
+        """
+        Update the columns to be returned, and the position of the group ID
+        within the returned values, after the columns or the group ID column
+        have been changed.
+        """
+        columns = list(self.requested_columns)
+        group = self.group_ID_column
+        if columns and group >= 0 and group not in columns:
+            columns.append(group)
+        Table_Reader.Set_Columns(self, columns)
+        if self.columns and group >= 0:
+            self.group_index = self.columns.index(group)
+        else:
+            self.group_index = group
+    
     
     
     # File I/O Methods #########################################################
@@ -160,6 +351,16 @@ class Subgrouped_Table_Reader(Table_Reader):
             self.printE(self._MSG__no_delimiter)
             return
     
+    def Close(self):
+        """
+        Close the object's file if the file is open, along with any temporary
+        files used in unsorted mode.
+        """
+        if self.unsorted_groups:
+            self.unsorted_groups.close()
+            self.unsorted_groups = None
+        Table_Reader.Close(self)
+    
     def Copy_Element(self, element):
         """
         Return a copy of the current values, sanitized.
@@ -169,36 +370,95 @@ class Subgrouped_Table_Reader(Table_Reader):
             copy.append(list(i))
         return copy
     
+    def Is_Empty_Element(self, element):
+        """
+        Return True if [element] is an "empty" element, that is to say, a list
+        containing only an empty row.
+        
+        Return False otherwise.
+        """
+        if element == self.empty_element:
+            return True
+        return False
+    
+    def Seek_Row(self, row_no):
+        """
+        Seeking to a row is not supported, as this reader returns groups of
+        rows.
+        
+        Return 3.
+        """
+        self.printE(self._MSG__seek_row_unsupported)
+        return 3
+    
     def Get_Size(self):
         """
-        Return the number of different groups in the table.
+        Return the number of different groups in the table, up to the first
+        empty row. Filters are not taken into account. In unsorted mode, every
+        different group ID is counted once, using a set.
+        
+        Only the group IDs are extracted from each row. The result is cached
+        against the size and time of last modification of the file, so the file
+        is only read through once for each version of the file.
+        
+        Return -1 if no filepath, group ID column, or delimiter has been set.
         """
         if ((self.file_path) and (self.group_ID_column != -1) and
                 (self.delimiter)):
-            count = 0
-            f = open(self.file_path, "U")
-            line = f.readline()
-            if self.header_params:
-                for param in self.header_params:
-                    if type(param) == int:
-                        while param > 0:
-                            line = f.readline()
-                            param -= 1
-                    if type(param) == str:
-                        while line.find(param) == 0:
-                            line = f.readline()
-            current_ID = ""
-            while line:
-                values = self._process_raw(line, self.delimiter, self.enclosers,
-                        self.keep_enclosers)
-                ID = values[self.group_ID_column]
-                if ID != current_ID:
-                    current_ID = ID
-                    count += 1
-                line = f.readline()
-            f.close()
+            key = [self.Get_File_Stamp(), self.group_ID_column,
+                    self.delimiter, list(self.enclosers), self.keep_enclosers,
+                    list(self.header_params), self.unsorted]
+            if self.group_count and self.group_count[0] == key:
+                return self.group_count[1]
+            count = self._count_groups()
+            self.group_count = [key, count]
             return count
         return -1
+    
+    def _count_groups(self):
+        """
+        Read through the current table file and return the number of different
+        groups, extracting only the group ID from each row.
+        """
+        count = 0
+        f = open(self.file_path, "U")
+        line = f.readline()
+        if self.header_params:
+            for param in self.header_params:
+                if type(param) == int:
+                    while param > 0:
+                        line = f.readline()
+                        param -= 1
+                if type(param) == str:
+                    while line.find(param) == 0:
+                        line = f.readline()
+        current_ID = None
+        IDs = set([])
+        while line not in LIST__empty_raw:
+            ID = self._get_group_ID(line)
+            if self.unsorted:
+                IDs.add(ID)
+            elif ID != current_ID:
+                current_ID = ID
+                count += 1
+            line = f.readline()
+        f.close()
+        if self.unsorted: return len(IDs)
+        return count
+    
+    def _get_group_ID(self, raw_str):
+        """
+        Extract only the group ID from a line of raw text from the table file,
+        splitting the line no further than the group ID column.
+        """
+        col_no = self.group_ID_column
+        if self.enclosers:
+            values = self._tokenize(raw_str, self.delimiter, self.enclosers,
+                    self.keep_enclosers, col_no + 1)
+        else:
+            values = self._split(raw_str, self.delimiter, col_no + 1)
+        if col_no < len(values): return values[col_no]
+        return ""
         
         
         
@@ -229,10 +489,115 @@ class Subgrouped_Table_Reader(Table_Reader):
                     line = self.file.readline()
         self.header_text = sb
         #
+        self.unsorted_active = self.unsorted
+        self.streaming_active = self.streaming and not self.unsorted
+        self.group_primed = False
+        self.group_unread = False
+        self.group_has_next = None
+        self.group_ID = ""
+        if self.unsorted_active:
+            if self.unsorted_groups: self.unsorted_groups.close()
+            self.unsorted_groups = self._group_unsorted(line)
+            return
+        #
+        line = self._skip_filtered(line)
         values = self._process_raw(line, self.delimiter, self.enclosers,
                 self.keep_enclosers)
         self.next_row = values
-        self.current_raw = self.file.readline()
+        self.next_row_empty = self._is_empty_row(values, line)
+        self.current_raw = self._skip_filtered(self.file.readline())
+    
+    def End(self):
+        """
+        Return True if the end of file has been reached.
+        Return False otherwise.
+        
+        In streaming mode, the file is looked ahead through to determine whether
+        there are any groups left, without reading any rows of the current
+        group. The result is kept until the next Read().
+        """
+        if self.streaming_active and not self.EOF:
+            if not self.group_unread: return self.next_row_empty
+            if self.group_has_next is None:
+                self.group_has_next = self._peek_group()
+            return not self.group_has_next
+        return self.EOF
+    
+    def _peek_group(self):
+        """
+        Return True if there is another group after the current one, looking
+        ahead through the file without moving the reading position. For use in
+        streaming mode.
+        Return False otherwise.
+        """
+        position = self.file.tell()
+        row_no = self.next_row_no
+        raw = self.current_raw
+        result = False
+        while raw not in LIST__empty_raw:
+            if self._get_group_ID(raw) != self.group_ID:
+                result = True
+                break
+            raw = self._skip_filtered(self.file.readline())
+        self.file.seek(position)
+        self.next_row_no = row_no
+        return result
+    
+    def Iterate_Group(self):
+        """
+        Yield the rows of the current group which have not been read yet, one
+        at a time, reading them from the file as they are needed. For use in
+        streaming mode.
+        
+        Iterate_Group() -> generator<list<str>>
+        """
+        while self.group_unread:
+            row = self.next_row
+            self.group_unread = self._read_row() == self.group_ID
+            yield row
+    
+    def Skip_Group(self):
+        """
+        Fast-forward past the rows of the current group which have not been read
+        yet, extracting only their group IDs. For use in streaming mode.
+        """
+        if not self.group_unread: return
+        while True:
+            raw = self.current_raw
+            if raw in LIST__empty_raw: break
+            if self._get_group_ID(raw) != self.group_ID: break
+            self.current_raw = self._skip_filtered(self.file.readline())
+        self._read_row()
+        self.group_unread = False
+    
+    def _read(self):
+        """
+        In streaming mode, skip the rest of the current group, and make the next
+        group the current group without reading in its rows. The current
+        element is then an empty list.
+        
+        Otherwise, the same as for File_Reader.
+        """
+        if not self.streaming_active:
+            Table_Reader._read(self)
+            return
+        if not self.group_primed: # Called by Open
+            self.group_primed = True
+            self.current_element = []
+            if self.next_row_empty: self.EOF = True
+            return
+        self.Skip_Group()
+        if self.next_row_empty:
+            self.group_ID = ""
+            self.current_element = []
+            self.EOF = True
+            self.printP(self._MSG__EOF_reached)
+            return
+        self.group_ID = self.next_row[self.group_index]
+        self.group_unread = True
+        self.group_has_next = None
+        self.current_element = []
+        self.current_index += 1
     
     def _get_next_element(self):
         """
@@ -240,35 +605,226 @@ class Subgrouped_Table_Reader(Table_Reader):
         
         Return an empty string if the end of the file has been reached.
         """
+        # Unsorted mode
+        if self.unsorted_active:
+            group = next(self.unsorted_groups, None)
+            if group is None: return [[""]]
+            return group
         # Next subgroup
         row = self.next_row
-        if row == [""]: return [[""]]
-        group_ID = row[self.group_ID_column]
+        if self.next_row_empty: return [[""]]
+        group_ID = row[self.group_index]
         result = [list(row)]
         # Read on, loop
         flag = True
         while flag:
             # Read
-            if self.enclosers:
-                values = self._process_raw(self.current_raw, self.delimiter,
-                        self.enclosers, self.keep_enclosers)
-            else:
-                values = self._process_raw__SIMPLE(self.current_raw,
-                        self.delimiter)
-            self.next_row = values
-            # Check for EOF
-            if values and values != [""]:
-                ID = values[self.group_ID_column]
-            else:
-                ID = None
+            ID = self._read_row()
             # Check for new section
             if ID != group_ID:
                 flag = False
             else:
-                result.append(values)
-            # Next
-            self.current_raw = self.file.readline()
+                result.append(self.next_row)
         # Return
         return result
+    
+    def _read_row(self):
+        """
+        Process the buffered line of raw text into the next row, and read in the
+        following line.
+        
+        Return the group ID of the next row, or None if it is an empty row.
+        """
+        values = self._process_line(self.current_raw)
+        self.next_row = values
+        self.next_row_empty = self._is_empty_row(values, self.current_raw)
+        self.current_raw = self._skip_filtered(self.file.readline())
+        if self.next_row_empty: return None
+        return values[self.group_index]
+    
+    def _process_line(self, raw_str):
+        """
+        Process a line of raw text from the table file into a row.
+        """
+        if self.enclosers:
+            return self._process_raw(raw_str, self.delimiter, self.enclosers,
+                    self.keep_enclosers)
+        return self._process_raw__SIMPLE(raw_str, self.delimiter)
+    
+    def _group_unsorted(self, line):
+        """
+        Read the rest of the file, starting from [line], and yield the groups
+        one at a time, for unsorted mode.
+        
+        The rows are grouped in memory until they exceed the memory limit. The
+        rows are then written out to temporary partition files by a hash of
+        their group IDs, along with the rest of the file, and the groups are
+        formed one partition at a time.
+        """
+        groups = {}
+        IDs = []
+        memory = 0
+        size = 0
+        line = self._skip_filtered(line)
+        while line not in LIST__empty_raw:
+            ID = self._get_group_ID(line)
+            if ID not in groups:
+                groups[ID] = []
+                IDs.append(ID)
+            groups[ID].append(line)
+            memory += len(line) + INT__row_overhead
+            size += len(line)
+            line = self._skip_filtered(self.file.readline())
+            if memory >= self.unsorted_memory: break
+        # All in memory
+        if line in LIST__empty_raw:
+            for ID in IDs:
+                yield [self._process_line(raw) for raw in groups[ID]]
+            return
+        # Partition
+        remaining = os.path.getsize(self.file_path) - self.file.tell()
+        number = min(2 * (size + remaining) // max(size, 1) + 1,
+                INT__max_partitions)
+        partitions = []
+        try:
+            for i in range(number):
+                if self.unsorted_temp_dir:
+                    partitions.append(tempfile.TemporaryFile(
+                            dir = self.unsorted_temp_dir))
+                else:
+                    partitions.append(tempfile.TemporaryFile())
+            for ID in IDs:
+                partition = partitions[_get_partition(ID, number)]
+                for raw in groups[ID]: partition.write(_end_line(raw))
+            groups = {}
+            IDs = []
+            while line not in LIST__empty_raw:
+                ID = self._get_group_ID(line)
+                partitions[_get_partition(ID, number)].write(_end_line(line))
+                line = self._skip_filtered(self.file.readline())
+            # Group each partition
+            for partition in partitions:
+                partition.seek(0)
+                for raw in partition:
+                    ID = self._get_group_ID(raw)
+                    if ID not in groups:
+                        groups[ID] = []
+                        IDs.append(ID)
+                    groups[ID].append(raw)
+                partition.close()
+                for ID in IDs:
+                    yield [self._process_line(raw) for raw in groups[ID]]
+                groups = {}
+                IDs = []
+        finally:
+            for partition in partitions: partition.close()
+    
+    def _get_map_tasks(self, func, starts):
+        """
+        Read the remaining groups and yield them as tasks for Map_Groups,
+        recording the time each task is sent out in [starts].
+        """
+        while not self.End():
+            self.Read()
+            if self.streaming_active: group = list(self.Iterate_Group())
+            else: group = self.current_element
+            starts.append(time.time())
+            yield [func, len(starts) - 1, group]
+    
+    def Map_Groups(self, func, workers=0, ordered=True, max_in_flight=0):
+        """
+        Read the remaining groups, apply [func] to each of them using a pool of
+        [workers] processes, and yield the results. The file must be opened
+        first. The groups are read in this process, and sent to the other
+        processes.
+        
+        If [ordered] is True, the results are yielded in the order the groups
+        appear in the file. Otherwise, they are yielded as soon as they are
+        ready.
+        
+        No more than [max_in_flight] groups are sent out without their results
+        having been yielded. Reading pauses until results are taken, so memory
+        usage stays bounded when [func] is slower than reading. Defaults to
+        twice the number of workers.
+        
+        [func] must be a module-level function, so that it can be passed to
+        other processes. It is given each group as a list of rows.
+        
+        In streaming mode, each group is read into memory before being sent.
+        
+        When all the groups have been processed, the number of groups, the time
+        taken, the throughput, and the latency per group are printed as a
+        metrics report, and can be accessed using Get_Map_Metrics.
+        
+        Raise a RuntimeError if [func] fails on any group, or if a group or its
+        result could not be passed between processes, such as when [func] is
+        not a module-level function. Errors raised while reading the file are
+        raised unchanged.
+        
+        Map_Groups(function, int, bool, int) -> generator
+        """
+        if not workers: workers = multiprocessing.cpu_count()
+        if not max_in_flight: max_in_flight = 2 * workers
+        self.map_metrics = {}
+        starts = []
+        latency_total = 0.0
+        latency_max = 0.0
+        time_start = time.time()
+        pool = multiprocessing.Pool(workers)
+        try:
+            for index, success, result, finished in _imap_bounded(pool,
+                    _map_group, self._get_map_tasks(func, starts), ordered,
+                    max_in_flight, self._MSG__map_pool_fail):
+                latency = finished - starts[index]
+                latency_total += latency
+                latency_max = max(latency_max, latency)
+                if not success:
+                    raise RuntimeError(self._MSG__map_fail.format(N = index,
+                            E = result))
+                yield result
+        finally:
+            pool.terminate()
+        sent = len(starts)
+        # Metrics
+        seconds = time.time() - time_start
+        self.map_metrics = {"groups": sent, "seconds": seconds,
+                "throughput": sent / max(seconds, 1e-9),
+                "mean_latency": latency_total / max(sent, 1),
+                "max_latency": latency_max}
+        self.printM(self._MSG__map_report.format(G = sent, T = seconds,
+                R = self.map_metrics["throughput"],
+                L = self.map_metrics["mean_latency"], M = latency_max))
+
+
+
+# Functions ####################################################################
 
+def _get_partition(ID, number):
+    """
+    Return the number of the partition, out of [number] partitions, which the
+    rows with group ID [ID] belong to.
+    """
+    return (zlib.crc32(ID) & 0xffffffff) % number
+
+def _end_line(raw_str):
+    """
+    Return a line of raw text with a newline at the end, so that it can be
+    written to a partition file.
+    """
+    if raw_str.endswith("\n"): return raw_str
+    return raw_str + "\n"
 
+def _map_group(task):
+    """
+    Apply a function to a group, for Map_Groups.
+    
+    [task] consists of the function, the group number, and the group.
+    
+    Return the group number, whether or not the function succeeded, the result
+    of the function, or the error if it failed, and the time it finished.
+    """
+    func, index, group = task
+    try:
+        return [index, True, func(group), time.time()]
+    except:
+        return [index, False, traceback.format_exc(), time.time()]
@@ -0,0 +1,171 @@
+"""
+TABLE FILE JOINER
+(version 1.0)
+by Angelo Chan
+
+This module contains functions for joining the rows of two data table files on
+a shared key, by reading through both files at the same time. Both files must
+already be sorted by their join columns, such as by Sort_Table.
+
+Only the rows which share the current key are held in memory, so memory usage
+does not depend on the size of the files.
+"""
+
+# Imported Modules #############################################################
+
+from Table_File_Sorter import *
+
+
+
+# Enums ########################################################################
+
+class JOIN:
+    INNER=1
+    LEFT=2
+    RIGHT=3
+    OUTER=4
+
+
+
+# Strings ######################################################################
+
+STR__join_unsorted = "The {SIDE} table is not sorted by its join column. Key "\
+        "\"{A}\" was followed by \"{B}\"."
+
+
+
+# Functions ####################################################################
+
+def Join_Tables(left, right, left_col, right_col, join=JOIN.INNER,
+            key_type=str):
+    """
+    Join the rows of two opened Table Readers on their join columns, and yield
+    the joined rows one at a time. Each joined row consists of the values from
+    the left row followed by the values from the right row.
+    
+    Rows which share a key are joined with every row on the other side which
+    has the same key. Rows which have no match on the other side are joined
+    with empty strings, if the join type keeps them.
+    
+    @left
+            (Table_Reader)
+            An opened Table Reader for the left table.
+    @right
+            (Table_Reader)
+            An opened Table Reader for the right table.
+    @left_col
+            (int)
+            The column number of the join column within the rows returned by
+            the left Table Reader.
+            This function uses a 0-indexing system. (i.e., the first column is
+            0)
+    @right_col
+            (int)
+            The column number of the join column within the rows returned by
+            the right Table Reader.
+    @join
+            (int) - JOIN
+            The join type:
+                INNER - Only keep rows with matches on both sides
+                LEFT - Also keep left rows without matches
+                RIGHT - Also keep right rows without matches
+                OUTER - Keep all rows
+    @key_type
+            (type)
+            The type of the join column values: str, int, or float. Both tables
+            must be sorted using this type. (See Sort_Table)
+    
+    Raise a ValueError if either table is found not to be sorted.
+    
+    Join_Tables(Table_Reader, Table_Reader, int, int, int, type) ->
+            generator<list<str>>
+    """
+    keep_left = join in [JOIN.LEFT, JOIN.OUTER]
+    keep_right = join in [JOIN.RIGHT, JOIN.OUTER]
+    left_pad = [""] * _get_width(left)
+    right_pad = [""] * _get_width(right)
+    left_group = _read_group(left, left_col, key_type, None, "left")
+    right_group = _read_group(right, right_col, key_type, None, "right")
+    # Both sides
+    while left_group and right_group:
+        if left_group[0] == right_group[0]:
+            for left_row in left_group[1]:
+                for right_row in right_group[1]:
+                    yield left_row + right_row
+            left_group = _read_group(left, left_col, key_type, left_group,
+                    "left")
+            right_group = _read_group(right, right_col, key_type, right_group,
+                    "right")
+        elif left_group[0] < right_group[0]:
+            if keep_left:
+                for left_row in left_group[1]: yield left_row + right_pad
+            left_group = _read_group(left, left_col, key_type, left_group,
+                    "left")
+        else:
+            if keep_right:
+                for right_row in right_group[1]: yield left_pad + right_row
+            right_group = _read_group(right, right_col, key_type, right_group,
+                    "right")
+    # Remaining rows
+    while left_group and keep_left:
+        for left_row in left_group[1]: yield left_row + right_pad
+        left_group = _read_group(left, left_col, key_type, left_group, "left")
+    while right_group and keep_right:
+        for right_row in right_group[1]: yield left_pad + right_row
+        right_group = _read_group(right, right_col, key_type, right_group,
+                "right")
+
+def Join_Tables_Batch(left, right, left_col, right_col, join=JOIN.INNER,
+            key_type=str, batch_size=100000):
+    """
+    Join the rows of two opened Table Readers the same way Join_Tables does, and
+    yield the joined rows in batches of up to [batch_size] rows. Each batch is
+    returned as a list of columns, with each column being a list of strings.
+    
+    Join_Tables_Batch(Table_Reader, Table_Reader, int, int, int, type, int) ->
+            generator<list<list<str>>>
+    """
+    rows = []
+    for row in Join_Tables(left, right, left_col, right_col, join, key_type):
+        rows.append(row)
+        if len(rows) == batch_size:
+            yield [list(column) for column in zip(*rows)]
+            rows = []
+    if rows: yield [list(column) for column in zip(*rows)]
+
+def _get_width(reader):
+    """
+    Return the number of values in the next row of [reader], or 0 if there are
+    no more rows.
+    """
+    if reader.EOF: return 0
+    return len(reader.next_element)
+
+def _read_group(reader, col_no, key_type, previous, side):
+    """
+    Read all the consecutive rows from [reader] which share the same key, and
+    return the key and the rows. Return None if there are no more rows.
+    
+    Raise a ValueError if the key is lower than the key of the [previous]
+    group.
+    """
+    if reader.EOF: return None
+    reader.Read()
+    rows = [reader.Get()]
+    key = _get_join_key(rows[0], col_no, key_type)
+    while not reader.EOF:
+        if _get_join_key(reader.next_element, col_no, key_type) != key: break
+        reader.Read()
+        rows.append(reader.Get())
+    if previous and key < previous[0]:
+        raise ValueError(STR__join_unsorted.format(SIDE = side,
+                A = previous[1][0][col_no], B = rows[0][col_no]))
+    return [key, rows]
+
+def _get_join_key(row, col_no, key_type):
+    """
+    Return the key of a row, for comparison with the keys of other rows.
+    """
+    if col_no < len(row): value = row[col_no]
+    else: value = ""
+    return Get_Sort_Key([value], [key_type])
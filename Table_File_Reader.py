@@ -1,16 +1,35 @@
 """
 TABLE FILE READER
-(version 2.1)
+(version 2.14)
 by Angelo Chan
 
 This module contains a Class capable of reading and interpretting files which
 contain data tables and returning the values of each row, line by line.
+
+Rows can also be read in batches and returned column by column, with numeric
+columns returned as NumPy arrays if NumPy is installed, or read in parallel by
+multiple processes. A sidecar index of row byte offsets allows rows to be
+jumped to directly, and a sidecar index of the values in a key column allows
+rows to be looked up by key.
 """
 
 # Imported Modules #############################################################
 
 from File_Reader import *
 
+from HyperLogLog import *
+
+from Sorted_Runs import *
+
+import bisect
+import multiprocessing
+import traceback
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
 
 # Enums ########################################################################
 
@@ -19,10 +38,27 @@ class KSR:
     SKIP=2
     REAR=3
 
+class FILTER:
+    EQ=1
+    IN=2
+    PREFIX=3
+    LT=4
+    LE=5
+    GT=6
+    GE=7
+
+
+
+# Floats #######################################################################
+
+FLOAT__poll_interval = 0.1 # Seconds between checks for results from processes
+
 
 
 # Lists ########################################################################
 
+LIST__empty_raw = ["", "\n", "\r"] # Raw lines which are processed as empty rows
+
 LIST__csv = ["CSV", "Csv", "csv"]
 LIST__tsv = ["TSV", "Tsv", "tsv", "TAB", "Tab", "tab"]
 LIST__ssv = ["SSV", "Ssv", "ssv"]
@@ -38,6 +74,12 @@ except:
 
 # Dictionaries #################################################################
 
+# NumPy data types for column types which can be stored as arrays
+if numpy is not None:
+    DICT__numpy_types = {int: numpy.int64, float: numpy.float64}
+else:
+    DICT__numpy_types = {}
+
 DICT__delimiters = {}
 for i in LIST__csv: DICT__delimiters[i] = ","
 for i in LIST__tsv: DICT__delimiters[i] = "\t"
@@ -64,6 +106,11 @@ class Table_Reader(File_Reader):
     f.Autodetect_Delimiter() # OR f.Set_Delimiter(",")
     f.Set_Enclosers(["\"", "'"])  # Optional
     f.Set_Keep_Enclosers(True)    # Optional
+    f.Set_Columns([0, 3])         # Optional - Only return these columns
+    f.Set_Schema({3: float})      # Optional - Column types, for Read_Batch
+    f.Set_Filters([[3, FILTER.EQ, "PASS"], [5, FILTER.GT, 0.5]]) # Optional
+    #                                   # Only return rows where column 3 is
+    #                                   # "PASS" and column 5 is above 0.5
     f.Set_Header_Params(["#", 1]) # Optional
     #                               Skip:
     #                                   all rows starting with "#", THEN
@@ -79,6 +126,27 @@ class Table_Reader(File_Reader):
         f.Read()
         # Your code - You may access buffered elements in f
     f.Close()
+    
+    Rows may also be read in batches, with each batch returned as a list of
+    columns:
+    
+    while not f.EOF:
+        columns = f.Read_Batch(100000)
+        # Your code
+    
+    Or in parallel, with each chunk of the file returned as a list of rows:
+    
+    for rows in f.Read_Parallel(workers=8):
+        # Your code
+    
+    Or from any row, using the row index:
+    
+    f.Seek_Row(1000000) # The next call to Read() will return row 1000000
+    
+    Or by the value in a key column, using the key index:
+    
+    f.Set_Key_Column(0)
+    rows = f.Lookup("ENSG00000139618")
     """
     
     # Minor Configurations #####################################################
@@ -91,6 +159,13 @@ class Table_Reader(File_Reader):
     _CONFIG__print_progress = False
     _CONFIG__print_metrics = True
     
+    _CONFIG__chunk_size = 67108864 # Default chunk size, in bytes, for parallel
+    _CONFIG__row_index_interval = 1000 # Rows per row index entry, by default
+    _CONFIG__key_index_sample = 256 # Key index entries per entry kept in memory
+    _CONFIG__key_index_memory = 67108864 # Memory limit, in bytes, for sorting
+    #                                      the key index before using temporary
+    #                                      files
+    
     
     
     # Strings ##################################################################
@@ -101,6 +176,27 @@ class Table_Reader(File_Reader):
     _MSG__no_delimiter = "No delimiter specified."
     _MSG__no_extension = "No file extension detected."
     
+    _MSG__invalid_columns = "Invalid column numbers specified.\nPlease "\
+            "specify a list of non-negative integers."
+    
+    _MSG__invalid_schema = "Invalid schema specified.\nPlease specify a "\
+            "dictionary of column numbers and types."
+    _MSG__convert_fail = "Column {C} could not be converted to {T}. The values"\
+            " have been left as strings."
+    
+    _MSG__invalid_filters = "Invalid filters specified.\nPlease specify a "\
+            "list of column numbers, FILTER types, and values."
+    
+    _MSG__row_index_write_fail = "WARNING: Could not write the row index file:"\
+            "\n\t{PATH}"
+    _MSG__row_oob = "Row number out-of-bounds error."
+    _MSG__seek_row_unsupported = "ERROR: This reader does not support seeking "\
+            "to a row."
+    
+    _MSG__key_index_write_fail = "ERROR: Could not write the key index file:"\
+            "\n\t{PATH}"
+    _MSG__no_key_column = "ERROR: No key column has been specified."
+    
     _MSG__header_oob = "Header parameter out-of-bounds error."
     _MSG__header_adv_unkn = "Advanced header parsing, "\
             "unknown section type error."
@@ -119,9 +215,19 @@ class Table_Reader(File_Reader):
         self.Set_Delimiter(delimiter)
         self.Set_Enclosers(enclosers)
         self.Set_Keep_Enclosers(keep_enclosers)
+        self.Set_Columns([])
+        self.Set_Schema({})
+        self.Set_Filters([])
         self.Set_Header_Params(header_params)
         self.prev_raw = self.current_raw = self.next_raw = ""
+        self.prev_row_no = self.current_row_no = -1
+        self.next_row_no = 0
         self.header_text = ""
+        self.row_index = None
+        self.row_index_stamp = None
+        self.key_column = -1
+        self.key_index = None
+        self.key_index_stamp = None
     
     
     
@@ -188,6 +294,104 @@ class Table_Reader(File_Reader):
         """
         self.keep_enclosers = boolean
 
+    def Set_Columns(self, indices):
+        """
+        Set the column numbers of the only columns to be returned, in the order
+        they are to be returned. Rows are only split as far as the last of these
+        columns. Columns missing from a row are returned as empty strings.
+        
+        All columns are returned if [indices] is empty.
+        
+        Uses a 0-index system. (The first column is column 0)
+        """
+        try:
+            indices = [int(i) for i in indices]
+            if indices and min(indices) < 0: 1/0
+        except:
+            indices = []
+            self.printE(self._MSG__invalid_columns)
+        self.columns = indices
+        if indices: self.columns_last = max(indices)
+        else: self.columns_last = -1
+    
+    def Get_Columns(self):
+        """
+        Return the column numbers of the only columns to be returned.
+        
+        Return an empty list if all columns are to be returned.
+        """
+        return list(self.columns)
+    
+    def Set_Schema(self, schema):
+        """
+        Set the types of the values in each column, for use by Read_Batch.
+        
+        [schema] is a dictionary of column numbers and types. Columns of ints or
+        floats are returned by Read_Batch as NumPy arrays if NumPy is installed.
+        Columns which are not in [schema] are returned as strings.
+        
+        Uses a 0-index system. (The first column is column 0)
+        """
+        try:
+            schema = dict(schema)
+            for col_no, type_ in schema.items():
+                if type(col_no) != int or not callable(type_): 1/0
+        except:
+            schema = {}
+            self.printE(self._MSG__invalid_schema)
+        self.schema = schema
+    
+    def Get_Schema(self):
+        """
+        Return the types of the values in each column, as a dictionary.
+        """
+        return dict(self.schema)
+    
+    def Set_Filters(self, filters):
+        """
+        Set the filters which rows must pass to be returned.
+        
+        [filters] is a list of triplets. Each triplet consists of a column
+        number, a FILTER type, and a value:
+            FILTER.EQ       The column value is equal to the value
+            FILTER.IN       The column value is in the value, a list or set
+            FILTER.PREFIX   The column value starts with the value
+            FILTER.LT/LE/GT/GE
+                            The column value is a number which is less than
+                            (or equal to), or greater than (or equal to), the
+                            value
+        Rows must pass every filter. Missing column values are treated as empty
+        strings. Filters are checked before the rows are processed, so rejected
+        rows are never fully processed.
+        
+        Filters do not affect the header, or Get_Size.
+        
+        Uses a 0-index system. (The first column is column 0)
+        """
+        results = []
+        try:
+            for col_no, filter_, value in filters:
+                col_no = int(col_no)
+                if col_no < 0: 1/0
+                if filter_ == FILTER.IN: value = set(value)
+                elif filter_ in [FILTER.EQ, FILTER.PREFIX]: value = str(value)
+                elif filter_ in [FILTER.LT, FILTER.LE, FILTER.GT, FILTER.GE]:
+                    value = float(value)
+                else: 1/0
+                results.append([col_no, filter_, value])
+        except:
+            results = []
+            self.printE(self._MSG__invalid_filters)
+        self.filters = results
+        if results: self.filters_last = max([i[0] for i in results])
+        else: self.filters_last = -1
+    
+    def Get_Filters(self):
+        """
+        Return the filters which rows must pass to be returned.
+        """
+        return [list(i) for i in self.filters]
+    
     def Set_Header_Params(self, params):
         """
         Set the header params of the file.
@@ -324,28 +528,17 @@ class Table_Reader(File_Reader):
     
     def Get_Size(self):
         """
-        Return the size of the table file.
+        Return the number of rows in the table file, not counting the header,
+        up to the first empty row. Filters are not taken into account.
+        
+        The row index is used if it is available and up to date, making this
+        instant. Otherwise, the file is read through.
         
         Return -1 if no filepath has been set.
         """
         if self.file_path:
-            count = 0
-            f = open(self.file_path, "U")
-            line = f.readline()
-            if self.header_params:
-                for param in self.header_params:
-                    if type(param) == int:
-                        while param > 0:
-                            line = self.file.readline()
-                            param -= 0
-                    if type(param) == str:
-                        while line.find(param) == 0:
-                            line = self.file.readline()
-            while line:
-                count += 1
-                line = f.readline()
-            f.close()
-            return count
+            if self._load_row_index_if_current(): return self.row_index[1]
+            return self._scan_rows(0)[1]
         return -1
     
     def Get_Raw(self):
@@ -354,6 +547,429 @@ class Table_Reader(File_Reader):
         """
         return self.prev_raw        
     
+    def Get_Row_No(self):
+        """
+        Return the row number of the current row, counting from the first row
+        after the header, which is row 0. Rows skipped by filters are counted.
+        
+        A long job can be restarted from where it left off by saving this
+        number, and later calling Seek_Row with the number plus one.
+        
+        Return -1 if no row has been read yet.
+        """
+        return self.prev_row_no
+    
+    
+    
+    # Row Index Methods ########################################################
+    
+    def Get_Row_Index_Path(self):
+        """
+        Return the file path of the row index file for the current file.
+        """
+        return self.file_path + ".rows"
+    
+    def Build_Row_Index(self, interval=0, write=True):
+        """
+        Index the current table file in a single pass through the file. The
+        index records the byte offset of every [interval]th row, as well as the
+        total number of rows.
+        
+        If [write] is True, the index will also be written to a row index file
+        alongside the table file.
+        
+        Return 0 if successful.
+        Return 1 if no filepath has been set.
+        """
+        if not self.file_path:
+            self.printE(self._MSG__unspecified_file_path)
+            return 1
+        if not interval: interval = self._CONFIG__row_index_interval
+        header_offset, rows, offsets = self._scan_rows(interval)
+        self.row_index = [interval, rows, offsets, header_offset]
+        self.row_index_stamp = self.Get_File_Stamp()
+        if write: self.Write_Row_Index()
+        return 0
+    
+    def Write_Row_Index(self, index_path=""):
+        """
+        Write the current row index to a row index file. If no file path is
+        specified, the index will be written alongside the table file.
+        
+        The first line of the file records the size and time of last
+        modification of the table file, the byte offset of the first row after
+        the header, the interval, and the number of rows. Each following line
+        is the byte offset of one indexed row.
+        
+        Return 0 if successful.
+        Return 1 if the index file could not be written.
+        """
+        if not index_path: index_path = self.Get_Row_Index_Path()
+        try:
+            o = open(index_path, "w")
+        except:
+            self.printE(self._MSG__row_index_write_fail.format(PATH =
+                    index_path))
+            return 1
+        interval, rows, offsets, header_offset = self.row_index
+        stamp = self.row_index_stamp
+        o.write("#\t" + "\t".join([str(stamp[1]), repr(stamp[2]),
+                str(header_offset), str(interval), str(rows)]) + "\n")
+        o.write("".join([str(i) + "\n" for i in offsets]))
+        o.close()
+        return 0
+    
+    def Load_Row_Index(self, index_path=""):
+        """
+        Load the row index of the current table file from a row index file. If
+        no file path is specified, the file alongside the table file will be
+        used.
+        
+        An index file made for a different version of the table file, or for
+        different header params, is not loaded.
+        
+        Return 0 if successful.
+        Return 1 if the index file could not be found or is out of date.
+        """
+        if not index_path: index_path = self.Get_Row_Index_Path()
+        stamp = self.Get_File_Stamp()
+        if not stamp or not os.path.isfile(index_path): return 1
+        f = open(index_path, "U")
+        values = f.readline().rstrip("\n").split("\t")
+        try:
+            if len(values) != 6 or values[0] != "#": 1/0
+            size, header_offset, interval, rows = [int(i) for i in
+                    values[1:2] + values[3:6]]
+            if size != stamp[1] or float(values[2]) != stamp[2]: 1/0
+            offsets = [int(line) for line in f]
+        except:
+            f.close()
+            return 1
+        f.close()
+        g = open(self.file_path, "rb")
+        current = self._get_header_offset(g)
+        g.close()
+        if header_offset != current: return 1
+        self.row_index = [interval, rows, offsets, header_offset]
+        self.row_index_stamp = stamp
+        return 0
+    
+    def Get_Row_Index(self):
+        """
+        Return the row index of the current table file, loading or building it
+        if necessary.
+        
+        The row index is a list of the interval, the number of rows, and the
+        byte offsets of every [interval]th row.
+        """
+        if not self._load_row_index_if_current(): self.Build_Row_Index()
+        return self.row_index[:3]
+    
+    def Seek_Row(self, row_no):
+        """
+        Move the reader to row number [row_no] using the row index, without
+        reading through the preceding rows. The next call to Read() will make
+        that row the "current" element, or the first row after it which passes
+        the filters.
+        
+        Row numbers start from 0 at the first row after the header.
+        
+        Return 0 if successful.
+        Return 1 if the file is not open.
+        Return 2 if there is no row number [row_no].
+        Return 3 if the reader does not support seeking to a row.
+        """
+        if not self.file_opened: return 1
+        interval, rows, offsets = self.Get_Row_Index()
+        if row_no < 0 or row_no >= rows:
+            self.printE(self._MSG__row_oob)
+            return 2
+        self.file.seek(offsets[row_no // interval])
+        for i in range(row_no % interval): self.file.readline()
+        # Prime the reader
+        self.next_row_no = row_no
+        self.next_raw = self._skip_filtered(self.file.readline())
+        self.next_element = self.Copy_Element(self.empty_element)
+        self.current_element = self.Copy_Element(self.empty_element)
+        self.current_index = row_no - 1
+        self.EOF = False
+        self._read()
+        return 0
+    
+    def _load_row_index_if_current(self):
+        """
+        Return True if an up to date row index is in memory, or can be loaded
+        from the row index file.
+        Return False otherwise.
+        """
+        stamp = self.Get_File_Stamp()
+        if self.row_index and self.row_index_stamp == stamp: return True
+        return self.Load_Row_Index() == 0
+    
+    def _scan_rows(self, interval):
+        """
+        Read through the current table file and return the byte offset of the
+        first row after the header, the number of rows up to the first empty
+        row, and the byte offsets of every [interval]th row. No offsets are
+        recorded if [interval] is 0.
+        """
+        f = open(self.file_path, "rb")
+        header_offset = self._get_header_offset(f)
+        f.seek(header_offset)
+        offset = header_offset
+        rows = 0
+        offsets = []
+        line = f.readline()
+        while line.rstrip("\r\n"):
+            if interval and not rows % interval: offsets.append(offset)
+            offset += len(line)
+            rows += 1
+            line = f.readline()
+        f.close()
+        return [header_offset, rows, offsets]
+    
+    
+    
+    # Key Index Methods ########################################################
+    
+    def Set_Key_Column(self, col_no):
+        """
+        Set the column number of the column whose values are to be used as keys
+        by Lookup and Lookup_Many.
+        
+        Uses a 0-index system. (The first column is column 0)
+        """
+        if col_no != self.key_column: self.key_index = None
+        self.key_column = col_no
+    
+    def Get_Key_Column(self):
+        """
+        Return the column number of the column whose values are used as keys.
+        """
+        return self.key_column
+    
+    def Get_Key_Index_Path(self, col_no=-1):
+        """
+        Return the file path of the key index file for column number [col_no] of
+        the current file, or for the key column if no column is specified.
+        """
+        if col_no == -1: col_no = self.key_column
+        return self.file_path + ".key" + str(col_no)
+    
+    def Build_Key_Index(self):
+        """
+        Index the key column of the current table file, and write the index to
+        a key index file alongside the table file.
+        
+        The key index file consists of the key of every row, sorted, along with
+        the byte offset of the row. Only a sample of the keys is kept in memory.
+        
+        Keys are sorted in memory in batches. If there are too many keys to sort
+        in memory at once, each batch is sorted and written to a temporary file,
+        and the batches are then merged, the same way Sort_Table does.
+        
+        Return 0 if successful.
+        Return 1 if no filepath or key column has been set.
+        Return 2 if the index file could not be written.
+        """
+        if not self.file_path:
+            self.printE(self._MSG__unspecified_file_path)
+            return 1
+        if self.key_column < 0:
+            self.printE(self._MSG__no_key_column)
+            return 1
+        stamp = self.Get_File_Stamp()
+        runs = []
+        batch = []
+        memory = 0
+        count = 0
+        f = open(self.file_path, "rb")
+        header_offset = self._get_header_offset(f)
+        f.seek(header_offset)
+        offset = header_offset
+        line = f.readline()
+        while line.rstrip("\r\n"):
+            key = self._get_key(line)
+            entry = key + "\t" + str(offset) + "\n"
+            batch.append((key, entry))
+            memory += len(entry) + INT__row_overhead
+            if memory >= self._CONFIG__key_index_memory:
+                runs.append(Write_Run(batch))
+                batch = []
+                memory = 0
+            count += 1
+            offset += len(line)
+            line = f.readline()
+        f.close()
+        batch.sort(key = Get_First)
+        index_path = self.Get_Key_Index_Path()
+        try:
+            o = open(index_path, "wb")
+        except:
+            for run in runs: run.close()
+            self.printE(self._MSG__key_index_write_fail.format(PATH =
+                    index_path))
+            return 2
+        o.write(self._get_key_index_header(stamp, header_offset, count))
+        if not runs:
+            o.write("".join([entry for key, entry in batch]))
+        else:
+            if batch: runs.append(Write_Run(batch))
+            Merge_Runs(runs, o, _get_index_key)
+        o.close()
+        return self.Load_Key_Index()
+    
+    def Load_Key_Index(self):
+        """
+        Load a sample of the key index of the current table file, from the key
+        index file alongside the table file.
+        
+        An index file made for a different version of the table file, or for
+        different header params, delimiters, or enclosers, is not loaded.
+        
+        Return 0 if successful.
+        Return 1 if the index file could not be found or is out of date.
+        """
+        index_path = self.Get_Key_Index_Path()
+        stamp = self.Get_File_Stamp()
+        if not stamp or not os.path.isfile(index_path): return 1
+        g = open(self.file_path, "rb")
+        header_offset = self._get_header_offset(g)
+        g.close()
+        f = open(index_path, "rb")
+        header = f.readline()
+        values = header.rstrip("\n").split("\t")
+        try:
+            count = int(values[-1])
+        except:
+            count = -1
+        if header != self._get_key_index_header(stamp, header_offset, count):
+            f.close()
+            return 1
+        keys = []
+        offsets = []
+        offset = len(header)
+        sample = self._CONFIG__key_index_sample
+        i = 0
+        for line in f:
+            if not i % sample:
+                keys.append(line.rsplit("\t", 1)[0])
+                offsets.append(offset)
+            offset += len(line)
+            i += 1
+        f.close()
+        self.key_index = [keys, offsets]
+        self.key_index_stamp = stamp
+        return 0
+    
+    def Lookup(self, key):
+        """
+        Return a list of all the rows whose value in the key column is [key],
+        in the order they appear in the file. The key index is loaded or built
+        if necessary.
+        
+        Filters are not applied.
+        
+        Return None if the key index is not available.
+        """
+        results = self.Lookup_Many([key])
+        if results == None: return None
+        return results[key]
+    
+    def Lookup_Many(self, keys):
+        """
+        Return a dictionary of each of the [keys] and a list of all the rows
+        whose value in the key column is that key. The keys are looked up in
+        sorted order, so the index file and the table file are read through
+        once, in one direction.
+        
+        Filters are not applied.
+        
+        Return None if the key index is not available.
+        """
+        if not self._load_key_index_if_current():
+            if self.Build_Key_Index(): return None
+        results = {}
+        index = open(self.Get_Key_Index_Path(), "rb")
+        table = open(self.file_path, "rb")
+        for key in sorted(set(keys)):
+            rows = []
+            for offset in self._find_key_offsets(index, key):
+                table.seek(offset)
+                rows.append(self._process_key_row(table.readline()))
+            results[key] = rows
+        index.close()
+        table.close()
+        return results
+    
+    def _load_key_index_if_current(self):
+        """
+        Return True if an up to date key index is in memory, or can be loaded
+        from the key index file.
+        Return False otherwise.
+        """
+        if self.key_column < 0: return False
+        stamp = self.Get_File_Stamp()
+        if self.key_index and self.key_index_stamp == stamp: return True
+        return self.Load_Key_Index() == 0
+    
+    def _get_key_index_header(self, stamp, header_offset, count):
+        """
+        Return the first line of a key index file, which records the size and
+        time of last modification of the table file, the byte offset of the
+        first row after the header, the key column, the reader settings which
+        affect the keys, and the number of keys.
+        """
+        settings = repr([self.delimiter, self.enclosers, self.keep_enclosers])
+        return "#\t" + "\t".join([str(stamp[1]), repr(stamp[2]),
+                str(header_offset), str(self.key_column), settings,
+                str(count)]) + "\n"
+    
+    def _find_key_offsets(self, index, key):
+        """
+        Return the byte offsets of all the rows whose key is [key], using the
+        sample of keys in memory to find the right part of the key index file,
+        [index].
+        """
+        keys, offsets = self.key_index
+        i = max(bisect.bisect_left(keys, key) - 1, 0)
+        if not offsets: return []
+        index.seek(offsets[i])
+        results = []
+        line = index.readline()
+        while line:
+            current, offset = line.rsplit("\t", 1)
+            if current == key: results.append(int(offset))
+            elif current > key: break
+            line = index.readline()
+        return results
+    
+    def _get_key(self, line):
+        """
+        Return the value in the key column of a line of raw text, read in binary
+        mode.
+        """
+        if line.endswith("\r\n"): line = line[:-2] + "\n"
+        col_no = self.key_column
+        if self.enclosers:
+            values = self._tokenize(line, self.delimiter, self.enclosers,
+                    self.keep_enclosers, col_no + 1)
+        else:
+            values = self._split(line, self.delimiter, col_no + 1)
+        if col_no < len(values): return values[col_no]
+        return ""
+    
+    def _process_key_row(self, line):
+        """
+        Process a line of raw text, read in binary mode, into a row, the way
+        Table_Reader would.
+        """
+        if line.endswith("\r\n"): line = line[:-2] + "\n"
+        if self.enclosers:
+            return Table_Reader._process_raw(self, line, self.delimiter,
+                    self.enclosers, self.keep_enclosers)
+        return Table_Reader._process_raw__SIMPLE(self, line, self.delimiter)
+    
     
     
     # File I/O Methods #########################################################
@@ -375,6 +991,142 @@ class Table_Reader(File_Reader):
     
     # File Reading Methods #####################################################
     
+    def Read_Batch(self, number):
+        """
+        Read up to [number] rows and return them as a list of columns. Each
+        column is converted to the type specified for it in the schema, all at
+        once.
+        
+        Columns of ints or floats are NumPy arrays if NumPy is installed. All
+        other columns are lists. The columns are in the same order as the values
+        in each row. Rows with fewer values are padded with empty strings.
+        
+        Return an empty list if there are no more rows.
+        """
+        rows = []
+        while len(rows) < number and not self.EOF:
+            self.Read()
+            rows.append(self.current_element)
+        if not rows: return []
+        width = max([len(row) for row in rows])
+        if min([len(row) for row in rows]) < width:
+            rows = [row + [""] * (width - len(row)) for row in rows]
+        results = []
+        for i, values in enumerate(zip(*rows)):
+            if self.columns: col_no = self.columns[i]
+            else: col_no = i
+            results.append(self._convert_column(values, col_no))
+        return results
+    
+    def Read_Parallel(self, workers=0, chunk_size=0, ordered=True, func=None,
+                max_in_flight=0):
+        """
+        Read all the rows after the header using a pool of [workers] processes,
+        and yield the rows one chunk at a time, as lists of rows. The file does
+        not need to be opened first.
+        
+        The file is split into chunks of about [chunk_size] bytes, at the ends
+        of lines. If [ordered] is True, the chunks are yielded in the order they
+        appear in the file. Otherwise, they are yielded as soon as they are
+        ready.
+        
+        If [func] is given, it is applied to each list of rows by the worker
+        processes, and its results are yielded instead. [func] must be a
+        module-level function, so that it can be passed to other processes.
+        
+        No more than [max_in_flight] chunks are sent out without having been
+        yielded. Another chunk is only sent out after one has been yielded, so
+        memory usage stays bounded when the rows are used more slowly than they
+        are read. Defaults to twice the number of workers.
+        
+        Rows are processed the same way as they are by Read, except that an
+        empty row only ends reading in ordered mode. In unordered mode, chunks
+        after an empty row may already have been yielded.
+        
+        Enclosers cannot span lines.
+        """
+        if not self.file_path:
+            self.printE(self._MSG__unspecified_file_path)
+            return
+        if not self.delimiter:
+            self.printE(self._MSG__no_delimiter)
+            return
+        if not workers: workers = multiprocessing.cpu_count()
+        if not chunk_size: chunk_size = self._CONFIG__chunk_size
+        if not max_in_flight: max_in_flight = 2 * workers
+        settings = [self.delimiter, self.enclosers, self.keep_enclosers,
+                self.columns, self.filters]
+        tasks = [[self.file_path, start, end, settings, func]
+                for start, end in self._get_chunk_offsets(chunk_size)]
+        pool = multiprocessing.Pool(workers)
+        try:
+            for result, ended in _imap_bounded(pool, _read_chunk, tasks,
+                    ordered, max_in_flight):
+                yield result
+                if ended and ordered: break
+        finally:
+            pool.terminate()
+    
+    def _get_chunk_offsets(self, chunk_size):
+        """
+        Return the start and end byte offsets of chunks of about [chunk_size]
+        bytes, covering all the rows after the header. Every chunk ends at the
+        end of a line.
+        """
+        f = open(self.file_path, "rb")
+        start = self._get_header_offset(f)
+        f.seek(0, 2)
+        size = f.tell()
+        results = []
+        while start < size:
+            f.seek(start + max(chunk_size, 1) - 1)
+            f.readline()
+            end = min(f.tell(), size)
+            results.append([start, end])
+            start = end
+        f.close()
+        return results
+    
+    def _get_header_offset(self, f):
+        """
+        Return the byte offset of the first row after the header in file [f],
+        which must be opened in binary mode, according to the header params.
+        
+        Mirrors Read_Header.
+        """
+        f.seek(0)
+        offset = 0
+        line = f.readline()
+        for param in self.header_params:
+            if type(param) == int:
+                while param > 0:
+                    offset += len(line)
+                    line = f.readline()
+                    param -= 1
+            if type(param) == str:
+                while line.find(param) == 0:
+                    offset += len(line)
+                    line = f.readline()
+        return offset
+    
+    def _convert_column(self, values, col_no):
+        """
+        Convert a tuple of strings from column number [col_no] into the type
+        specified in the schema.
+        
+        Columns which cannot be converted are returned as lists of strings.
+        """
+        type_ = self.schema.get(col_no, str)
+        if type_ == str: return list(values)
+        try:
+            if type_ in DICT__numpy_types:
+                return numpy.array(values).astype(DICT__numpy_types[type_])
+            return map(type_, values)
+        except ValueError:
+            self.printE(self._MSG__convert_fail.format(C = col_no,
+                    T = type_.__name__))
+            return list(values)
+    
     def Read_Header(self):
         """
         Read in the header rows of the file and store them separately according
@@ -398,7 +1150,9 @@ class Table_Reader(File_Reader):
                 while line.find(param) == 0:
                     sb += line
                     line = self.file.readline()
-        self.next_raw = line
+        self.prev_row_no = self.current_row_no = -1
+        self.next_row_no = 0
+        self.next_raw = self._skip_filtered(line)
         self.header_text = sb
     
     def _get_next_element(self):
@@ -409,41 +1163,139 @@ class Table_Reader(File_Reader):
         """
         self.prev_raw = self.current_raw
         self.current_raw = self.next_raw
-        self.next_raw = self.file.readline()
+        self.prev_row_no = self.current_row_no
+        self.current_row_no = self.next_row_no
+        self.next_row_no += 1
+        self.next_raw = self._skip_filtered(self.file.readline())
         if self.enclosers:
             return self._process_raw(self.current_raw, self.delimiter,
                     self.enclosers, self.keep_enclosers)
         return self._process_raw__SIMPLE(self.current_raw, self.delimiter)
     
+    def _skip_filtered(self, line):
+        """
+        Return [line] if it passes the filters. Otherwise, read on and return
+        the first line which does, or the first line which would be processed
+        as an empty row.
+        """
+        if not self.filters: return line
+        while line not in LIST__empty_raw and not self._check_filters(line):
+            line = self.file.readline()
+            self.next_row_no += 1
+        return line
+    
+    def _check_filters(self, raw_str):
+        """
+        Return True if a line of raw text passes all the filters.
+        Return False otherwise.
+        
+        Values being tested for equality or as prefixes are first looked for
+        in the raw text, so most rejected lines are never split.
+        """
+        if not (self.enclosers and not self.keep_enclosers):
+            for col_no, filter_, value in self.filters:
+                if filter_ in [FILTER.EQ, FILTER.PREFIX]:
+                    if value not in raw_str: return False
+        if self.enclosers:
+            values = self._tokenize(raw_str, self.delimiter, self.enclosers,
+                    self.keep_enclosers, self.filters_last + 1)
+        else:
+            values = self._split(raw_str, self.delimiter, self.filters_last + 1)
+        size = len(values)
+        for col_no, filter_, value in self.filters:
+            if col_no < size: string = values[col_no]
+            else: string = ""
+            if filter_ == FILTER.EQ:
+                if string != value: return False
+            elif filter_ == FILTER.IN:
+                if string not in value: return False
+            elif filter_ == FILTER.PREFIX:
+                if not string.startswith(value): return False
+            else:
+                try:
+                    number = float(string)
+                except ValueError:
+                    return False
+                if filter_ == FILTER.LT: passed = number < value
+                elif filter_ == FILTER.LE: passed = number <= value
+                elif filter_ == FILTER.GT: passed = number > value
+                else: passed = number >= value
+                if not passed: return False
+        return True
+    
     def _process_raw(self, raw_str, delim, enclosers, keep_enclosers):
         """
         Process a line of raw text from the table file into a list of strings.
         
         Delimiters enclosed within [enclosers] chars are not treated delimiters.
+        
+        The line is split at every delimiter first, and only the pieces which
+        contain enclosers, or which lie within an enclosed section, are looked
+        through further, by jumping from one encloser to the next. Lines which
+        contain no enclosers are processed the simple way.
+        
+        If only some columns are to be returned, processing stops after the last
+        of those columns.
+        """
+        if not self.columns:
+            return self._tokenize(raw_str, delim, enclosers, keep_enclosers)
+        return self._project(self._tokenize(raw_str, delim, enclosers,
+                keep_enclosers, self.columns_last + 1), raw_str)
+    
+    def _tokenize(self, raw_str, delim, enclosers, keep_enclosers, limit=-1):
+        """
+        Break a line of raw text into a list of strings, as described for
+        _process_raw, stopping after the first [limit] strings unless [limit] is
+        -1.
         """
-        flag = False
+        enclosers = [e for e in enclosers if type(e) == str and len(e) == 1]
+        for e in enclosers:
+            if e in raw_str: break
+        else:
+            return self._split(raw_str, delim, limit)
+        if len(delim) == 1 and delim not in enclosers:
+            pieces = raw_str.split(delim)
+        else:
+            pieces = [raw_str]
         active_encloser = ""
-        sb = ""
+        sb = []
         results = []
-        for c in raw_str:
-            if flag:
-                if c == active_encloser:
-                    if keep_enclosers: sb += c
-                    flag = False
+        for piece in pieces:
+            if len(results) == limit: break
+            if not active_encloser:
+                for e in enclosers:
+                    if e in piece: break
                 else:
-                    sb += c
-            else:
-                if c in enclosers:
-                    if keep_enclosers: sb += c
-                    flag = True
-                    active_encloser = c
-                elif c == delim:
-                    results.append(sb)
-                    sb = ""
+                    results.append(piece)
+                    continue
+            i = 0
+            while True:
+                if active_encloser:
+                    j = piece.find(active_encloser, i)
                 else:
-                    sb += c
-        if sb and sb[-1] in LIST__newline: sb = sb[:-1]
-        results.append(sb)
+                    j = -1
+                    for e in enclosers:
+                        k = piece.find(e, i)
+                        if k != -1 and (j == -1 or k < j): j = k
+                if j == -1:
+                    sb.append(piece[i:])
+                    break
+                if keep_enclosers: sb.append(piece[i:j + 1])
+                else: sb.append(piece[i:j])
+                if active_encloser: active_encloser = ""
+                else: active_encloser = piece[j]
+                i = j + 1
+            if active_encloser:
+                sb.append(delim)
+            else:
+                results.append("".join(sb))
+                sb = []
+        else:
+            if active_encloser:
+                sb.pop() # The last piece is not followed by a delimiter
+                results.append("".join(sb))
+            last = results[-1]
+            if last and last[-1] in LIST__newline: results[-1] = last[:-1]
         return results
     
     def _process_raw__SIMPLE(self, raw_str, delim):
@@ -453,18 +1305,36 @@ class Table_Reader(File_Reader):
         This is the simple version of the function for when there are no
         enclosers.
         """
-        sb = ""
-        results = []
-        for c in raw_str:
-            if c == delim:
-                results.append(sb)
-                sb = ""
-            else:
-                sb += c
-        if sb and sb[-1] in LIST__newline: sb = sb[:-1]
-        results.append(sb)
+        if not self.columns: return self._split(raw_str, delim)
+        return self._project(self._split(raw_str, delim,
+                self.columns_last + 1), raw_str)
+    
+    def _split(self, raw_str, delim, limit=-1):
+        """
+        Split a line of raw text at every delimiter, or only at the first
+        [limit] delimiters unless [limit] is -1, and remove the newline from the
+        end.
+        """
+        if len(delim) != 1: results = [raw_str]
+        else: results = raw_str.split(delim, limit)
+        last = results[-1]
+        if last and last[-1] in LIST__newline: results[-1] = last[:-1]
         return results
     
+    def _project(self, values, raw_str):
+        """
+        Return only the values in the columns which are to be returned, given
+        the values processed from [raw_str]. Missing values are returned as
+        empty strings.
+        
+        Empty rows, as decided by [raw_str], are returned unchanged. Note that a
+        row whose only returned value is empty will look the same as an empty
+        row. (See _is_empty_row)
+        """
+        if raw_str in LIST__empty_raw: return values
+        size = len(values)
+        return [values[i] if i < size else "" for i in self.columns]
+    
     def Is_Empty_Element(self, element):
         """
         Return True if [element] is an "empty" element, that is to say, an empty
@@ -473,13 +1343,130 @@ class Table_Reader(File_Reader):
         Return False otherwise.
         """
         if element == self.empty_element:
+            if self.columns: return self._is_empty_row(element,
+                    self.current_raw)
             return True
         return False
+    
+    def _is_empty_row(self, values, raw_str):
+        """
+        Return True if [values], processed from [raw_str], is an empty row.
+        
+        If only some columns are to be returned, whether or not the row is empty
+        depends on [raw_str], as the returned values may all be empty even when
+        the row is not.
+        """
+        if values != [""]: return False
+        if self.columns: return raw_str in LIST__empty_raw
+        return True
 
 
 
 # Functions ####################################################################
 
+def _get_index_key(entry):
+    """
+    Return the key of an entry in a key index file.
+    """
+    return entry.rsplit("\t", 1)[0]
+
+def _imap_bounded(pool, func, tasks, ordered, max_in_flight, fail_message=""):
+    """
+    Apply [func] to each of [tasks] using [pool], and yield the results, in the
+    order of [tasks] if [ordered] is True, or as soon as they are ready
+    otherwise.
+    
+    No more than [max_in_flight] tasks are sent out without their results
+    having been yielded, and [tasks] is only iterated through as needed, so
+    that results do not build up when they are used more slowly than they are
+    produced.
+    
+    Errors raised in the pool, including for tasks or results which could not
+    be passed between processes, are raised again here. If [fail_message] is
+    given, they are instead raised as a RuntimeError, with [fail_message]
+    formatted with the traceback as {E}. Errors raised while iterating through
+    [tasks] are always raised unchanged.
+    """
+    tasks = iter(tasks)
+    pending = []
+    while True:
+        # Send
+        while len(pending) < max_in_flight:
+            task = next(tasks, None)
+            if task is None: break
+            try:
+                pending.append(pool.apply_async(func, [task]))
+            except Exception:
+                _raise_pool_error(fail_message)
+        if not pending: return
+        # Receive
+        if ordered: candidates = pending[:1]
+        else: candidates = pending
+        index = -1
+        while index == -1:
+            for i, result in enumerate(candidates):
+                if result.ready():
+                    index = i
+                    break
+            else:
+                pending[0].wait(FLOAT__poll_interval)
+        try:
+            result = pending.pop(index).get()
+        except Exception:
+            _raise_pool_error(fail_message)
+        yield result
+
+def _raise_pool_error(fail_message):
+    """
+    Raise the error currently being handled again, as a RuntimeError with
+    [fail_message] formatted with the traceback as {E}, or unchanged if no
+    [fail_message] is given. For use by _imap_bounded.
+    """
+    if not fail_message: raise
+    raise RuntimeError(fail_message.format(E = traceback.format_exc()))
+
+def _read_chunk(task):
+    """
+    Read and process the rows in a chunk of a table file, for Read_Parallel.
+    
+    [task] consists of the file path, the start and end byte offsets of the
+    chunk, the reader settings, and the function (or None) to be applied to
+    the rows.
+    
+    Return the rows, or the result of the function, and whether or not an empty
+    row was found. Rows from the empty row onwards are left out.
+    """
+    file_path, start, end, settings, func = task
+    delimiter, enclosers, keep_enclosers, columns, filters = settings
+    reader = Table_Reader(delimiter=delimiter, enclosers=enclosers,
+            keep_enclosers=keep_enclosers)
+    reader.Set_Columns(columns)
+    reader.Set_Filters(filters)
+    f = open(file_path, "rb")
+    f.seek(start)
+    data = f.read(end - start)
+    f.close()
+    # Universal newlines, as used by Read
+    data = data.replace("\r\n", "\n").replace("\r", "\n")
+    lines = data.split("\n")
+    if data.endswith("\n"): lines.pop()
+    rows = []
+    ended = False
+    for line in lines:
+        if filters and line and not reader._check_filters(line): continue
+        if enclosers:
+            values = reader._process_raw(line, delimiter, enclosers,
+                    keep_enclosers)
+        else:
+            values = reader._process_raw__SIMPLE(line, delimiter)
+        if reader._is_empty_row(values, line):
+            ended = True
+            break
+        rows.append(values)
+    if func: return [func(rows), ended]
+    return [rows, ended]
+
+
 def Col_No_To_Set(files, file_format, col_no=0):
     """
     Return a set of all the values found in column number [col_no] of the files
@@ -509,6 +1496,9 @@ def Col_No_To_Set(files, file_format, col_no=0):
     f = Table_Reader()
     delim = DICT__delimiters[file_format]
     f.Set_Delimiter(delim)
+    if col_no >= 0:
+        f.Set_Columns([col_no])
+        col_no = 0
     
     # Read
     for file_ in files:
@@ -523,11 +1513,111 @@ def Col_No_To_Set(files, file_format, col_no=0):
     # Return
     return result
 
+def Col_No_To_Set__PARALLEL(files, file_format, col_no=0, workers=0,
+            counts=False, approximate=False, precision=14):
+    """
+    Return a set of all the values found in column number [col_no] of the files
+    in [files], the same as Col_No_To_Set, but scan the files concurrently
+    using a pool of [workers] processes, one file per process at a time.
+    
+    Only the target column is extracted from each row, and the results of each
+    file are merged as soon as they are ready.
+    
+    @files
+            (list<str - dirpath>)
+            A list of the files to be scanned.
+    @file_format
+            (str)
+            The file format of the input file. Acceptable options are:
+                tsv - Tab-separated values
+                csv - Comma-separated values
+                ssv - Space-separated values
+    @col_no
+            (int)
+            The column number to be looked at.
+            This function uses a 0-indexing system. (i.e., the first column is
+            0)
+    @workers
+            (int)
+            The number of processes to use. Defaults to the number of CPUs, or
+            the number of files, whichever is lower.
+    @counts
+            (bool)
+            Whether to return a dictionary of how many times each value was
+            found, instead of a set.
+    @approximate
+            (bool)
+            Whether to return an estimate of the number of different values
+            instead, using a HyperLogLog counter. Memory usage depends only on
+            [precision], not on the number of different values. Overrides
+            [counts].
+    @precision
+            (int)
+            The precision of the HyperLogLog counter. (See HyperLogLog)
+    
+    Col_No_To_Set__PARALLEL(list<str>, str, int, int, bool, bool, int) ->
+            set<str>
+    Col_No_To_Set__PARALLEL(list<str>, str, int, int, bool, bool, int) ->
+            dict<str:int>
+    Col_No_To_Set__PARALLEL(list<str>, str, int, int, bool, bool, int) -> int
+    """
+    # Setup - Results
+    if approximate: result = HyperLogLog(precision)
+    elif counts: result = {}
+    else: result = set([])
+    
+    # Setup - Tasks
+    delim = DICT__delimiters[file_format]
+    tasks = [[file_, delim, col_no, counts, approximate, precision]
+            for file_ in files]
+    if not workers: workers = multiprocessing.cpu_count()
+    workers = max(min(workers, len(tasks)), 1)
+    
+    # Read and merge
+    pool = multiprocessing.Pool(workers)
+    try:
+        for values in pool.imap_unordered(_col_no_to_set__file, tasks):
+            if approximate:
+                result.Merge(values)
+            elif counts:
+                for value, count in values.iteritems():
+                    result[value] = result.get(value, 0) + count
+            else:
+                result.update(values)
+    finally:
+        pool.terminate()
+    
+    # Return
+    if approximate: return result.Estimate()
+    return result
 
-
-
-
-
-
-
-
+def _col_no_to_set__file(task):
+    """
+    Return the values found in one column of a table file, for
+    Col_No_To_Set__PARALLEL, as a set, a dictionary of counts, or a HyperLogLog
+    counter.
+    
+    [task] consists of the file path, the delimiter, the column number, whether
+    to count the values, whether to estimate the number of different values,
+    and the HyperLogLog precision.
+    
+    Like Table_Reader, reading stops at the first empty row.
+    """
+    file_path, delim, col_no, counts, approximate, precision = task
+    if approximate: result = HyperLogLog(precision)
+    elif counts: result = {}
+    else: result = set([])
+    reader = Table_Reader(delimiter=delim)
+    if col_no >= 0: limit = col_no + 1
+    else: limit = -1
+    f = open(file_path, "U")
+    for line in f:
+        if line in LIST__empty_raw: break
+        values = reader._split(line, delim, limit)
+        if -len(values) <= col_no < len(values): value = values[col_no]
+        else: value = ""
+        if approximate: result.Add(value)
+        elif counts: result[value] = result.get(value, 0) + 1
+        else: result.add(value)
+    f.close()
+    return result
@@ -0,0 +1,170 @@
+"""
+TABLE FILE SORTER
+(version 1.2)
+by Angelo Chan
+
+This module contains a function for sorting data table files by the values in
+one or more columns, using a limited amount of memory, so that they can be read
+by readers which require sorted input, such as the Subgrouped Table Reader and
+the GTF Reader.
+
+Rows are sorted in memory in batches. Batches which do not fit within the memory
+limit are sorted and written to temporary files as sorted runs, and the runs are
+then merged, using the Sorted Runs module.
+"""
+
+# Imported Modules #############################################################
+
+from Table_File_Reader import *
+
+from Sorted_Runs import *
+
+
+
+# Functions ####################################################################
+
+def Sort_Table(path_in, path_out, keys, delimiter="\t", enclosers=[],
+            keep_enclosers=True, header_params=[], max_memory=268435456,
+            temp_dir=""):
+    """
+    Sort the rows of a table file by the values in one or more columns, and
+    write the sorted rows to a new file. The header, as specified by
+    [header_params], is written out first, unchanged. The rows are written out
+    exactly as they were read.
+    
+    @path_in
+            (str - filepath)
+            The file path of the table file to be sorted.
+    @path_out
+            (str - filepath)
+            The file path of the sorted table file to be written.
+    @keys
+            (list<[int, type]>)
+            The columns to sort by, in order of priority. Each column is
+            specified by a pair of a column number and a type: str, int, or
+            float. Values which cannot be converted to numbers are sorted after
+            all numbers, as strings. Strings are compared byte by byte.
+            This function uses a 0-indexing system. (i.e., the first column is
+            0)
+    @delimiter
+            (str)
+            The delimiter which separates the values in the table file.
+    @enclosers
+            (list<str>)
+            Characters within which delimiters are not treated as delimiters.
+    @keep_enclosers
+            (bool)
+            Whether or not the enclosers are kept as part of the values
+            compared.
+    @header_params
+            (list<int/str>)
+            The header params of the table file. (See
+            Table_Reader.Set_Header_Params)
+    @max_memory
+            (int)
+            The approximate maximum number of bytes of rows to be held in
+            memory at once.
+    @temp_dir
+            (str - dirpath)
+            The directory for the temporary files. The system default is used if
+            no directory is specified.
+    
+    Like Table_Reader, sorting stops at the first empty row.
+    
+    The sort is stable. Rows with the same keys stay in their original order.
+    
+    Return 0 if successful.
+    Return 1 if the keys are invalid.
+    Return 2 if the input file could not be read.
+    Return 3 if the output file could not be written.
+    
+    Sort_Table(str, str, list<[int, type]>, str, list<str>, bool, list<int/str>,
+            int, str) -> int
+    """
+    # Setup - Keys
+    try:
+        types = [type_ for col_no, type_ in keys]
+        columns = [int(col_no) for col_no, type_ in keys]
+        if not columns or min(columns) < 0: 1/0
+        if False in [callable(type_) for type_ in types]: 1/0
+    except:
+        return 1
+    # Setup - Reader
+    f = Table_Reader(delimiter=delimiter, enclosers=enclosers,
+            header_params=header_params, keep_enclosers=keep_enclosers)
+    f.Set_Columns(columns)
+    f.Open(path_in)
+    if not f.file_opened: return 2
+    try:
+        o = open(path_out, "w")
+    except:
+        f.Close()
+        return 3
+    o.write(f.Get_Header_Text())
+    # Read and sort in batches
+    runs = []
+    batch = []
+    memory = 0
+    while not f.EOF:
+        f.Read()
+        raw = f.Get_Raw()
+        if not raw.endswith("\n"): raw += "\n"
+        batch.append((Get_Sort_Key(f.Get_Current_SOFT(), types), raw))
+        memory += len(raw) + INT__row_overhead
+        if memory >= max_memory:
+            runs.append(Write_Run(batch, temp_dir))
+            batch = []
+            memory = 0
+    f.Close()
+    batch.sort(key = Get_First)
+    # Write out
+    if not runs:
+        o.write("".join([raw for key, raw in batch]))
+    else:
+        if batch: runs.append(Write_Run(batch, temp_dir))
+        def get_key(raw): return _get_run_key(f, raw, types)
+        Merge_Runs(runs, o, get_key)
+    o.close()
+    return 0
+
+def Get_Sort_Key(values, types):
+    """
+    Return the key by which Sort_Table sorts a row, given the values in the key
+    columns and the types of the key columns.
+    
+    Numbers are returned as (0, number) and values which could not be converted
+    into numbers as (1, value), so that numbers are sorted first.
+    
+    @values
+            (list<str>)
+            The values in the key columns, in order of priority.
+    @types
+            (list<type>)
+            The types of the key columns: str, int, or float.
+    
+    Get_Sort_Key(list<str>, list<type>) -> list
+    """
+    results = []
+    for value, type_ in zip(values, types):
+        if type_ == str:
+            results.append(value)
+            continue
+        try:
+            number = type_(value)
+            if number != number: 1/0 # NaN
+            results.append((0, number))
+        except:
+            results.append((1, value))
+    return results
+
+def _get_run_key(reader, raw, types):
+    """
+    Return the sort key for a row read back from a run, processing it the same
+    way [reader] did.
+    """
+    if reader.enclosers:
+        values = reader._process_raw(raw, reader.delimiter, reader.enclosers,
+                reader.keep_enclosers)
+    else:
+        values = reader._process_raw__SIMPLE(raw, reader.delimiter)
+    return Get_Sort_Key(values, types)
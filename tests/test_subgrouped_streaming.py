@@ -0,0 +1,82 @@
+"""
+SUBGROUPED STREAMING CHECKS
+(version 1.0)
+by Angelo Chan
+
+Checks that the Subgrouped Table Reader's streaming mode returns every row of
+every group, including when End() is called before the group is iterated over.
+
+Run directly, or with pytest:
+    
+    python tests/test_subgrouped_streaming.py
+"""
+
+# Imported Modules #############################################################
+
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+        ".."))
+
+from Subgrouped_Table_File_Reader import *
+
+
+
+# Strings ######################################################################
+
+STR__contents = "A\t1\nA\t2\nB\t3\nC\t4\nC\t5\n"
+
+
+
+# Functions ####################################################################
+
+def _read_groups(path, end_first):
+    """
+    Read every group in [path] in streaming mode, returning a list of the group
+    IDs, the rows of each group, and the values End() returned before and after
+    each group was iterated over.
+    
+    If [end_first] is True, End() is called before each group is iterated over.
+    """
+    f = Subgrouped_Table_Reader(path, 0, delimiter="\t")
+    f.Set_Streaming(True)
+    f.Open()
+    results = []
+    while not f.End():
+        f.Read()
+        before = None
+        if end_first: before = f.End()
+        rows = list(f.Iterate_Group())
+        results.append([f.Get_Group_ID(), rows, before, f.End()])
+    f.Close()
+    return results
+
+def test_end_before_iterate():
+    """
+    Check that calling End() before Iterate_Group() does not lose any rows, and
+    that End() is only True on the last group.
+    """
+    handle, path = tempfile.mkstemp(suffix = ".tsv")
+    os.write(handle, STR__contents)
+    os.close(handle)
+    try:
+        expected = [
+            ["A", [["A", "1"], ["A", "2"]], False, False],
+            ["B", [["B", "3"]], False, False],
+            ["C", [["C", "4"], ["C", "5"]], True, True],
+            ]
+        assert _read_groups(path, True) == expected
+        assert _read_groups(path, False) == [e[:2] + [None, e[3]]
+                for e in expected]
+    finally:
+        os.remove(path)
+
+
+
+# Main #########################################################################
+
+if __name__ == "__main__":
+    test_end_before_iterate()
+    print("Streaming checks passed.")
@@ -0,0 +1,147 @@
+"""
+TOKENIZER CORPUS
+(version 1.1)
+by Angelo Chan
+
+A self-checking corpus which compares the Table Reader's tokenizer against the
+original character-by-character tokenizer it replaced.
+
+Run directly, or with pytest:
+    
+    python tests/test_tokenizer.py
+"""
+
+# Imported Modules #############################################################
+
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+        ".."))
+
+from Table_File_Reader import *
+
+
+
+# Lists ########################################################################
+
+LIST__corpus = [
+    # Plain and empty fields
+    "a,b,c",
+    "a,,c",
+    ",,",
+    ",",
+    "",
+    "a",
+    # Trailing delimiters
+    "a,b,",
+    "a,b,,",
+    # Newlines
+    "a,b\n",
+    "a,b\r\n",
+    "a,b\r",
+    "a,b,\n",
+    "\n",
+    "\r\n",
+    "\r",
+    "a,\"b\n",
+    # Quoted fields
+    "\"a,b\",c",
+    "a,\"b,c\"",
+    "\"a\",\"b\",\"\"",
+    "'a,b',\"c,d\"",
+    "\"a,'b,c',d\",e",
+    "'a,\"b,c\",d',e",
+    "a\"b,c\"d,e",
+    "\"\"\"a,b\"\"\",c",
+    "\"a,b",
+    "\"a,b\n",
+    "a,\"b,c\r\n",
+    "\"\",\"\",",
+    "\",\",\",\"",
+    ]
+
+LIST__delimiters = [",", "\t", " "]
+
+LIST__enclosers = [[], ["\""], ["\"", "'"], ["'"]]
+
+LIST__columns = [[], [0], [1], [2], [0, 2], [2, 0], [5], [0, 0], [1, 5]]
+
+
+
+# Functions ####################################################################
+
+def _reference_tokenize(raw_str, delim, enclosers, keep_enclosers):
+    """
+    The original tokenizer, which reads one character at a time.
+    """
+    flag = False
+    active_encloser = ""
+    sb = ""
+    results = []
+    for c in raw_str:
+        if flag:
+            if c == active_encloser:
+                if keep_enclosers: sb += c
+                flag = False
+            else:
+                sb += c
+        else:
+            if c in enclosers:
+                if keep_enclosers: sb += c
+                flag = True
+                active_encloser = c
+            elif c == delim:
+                results.append(sb)
+                sb = ""
+            else:
+                sb += c
+    if sb and sb[-1] in LIST__newline: sb = sb[:-1]
+    results.append(sb)
+    return results
+
+def _reference_project(values, columns, raw_str):
+    """
+    Return only the values in [columns], with missing values as empty strings,
+    the same way the original tokenizer's results would be projected. Empty
+    rows are returned unchanged.
+    """
+    if not columns or raw_str in LIST__empty_raw: return values
+    return [values[i] if i < len(values) else "" for i in columns]
+
+def test_tokenizer():
+    """
+    Check every line of the corpus, with every delimiter, set of enclosers, and
+    set of columns, against the original tokenizer.
+    
+    Return the number of cases checked.
+    """
+    reader = Table_Reader()
+    count = 0
+    for columns in LIST__columns:
+        reader.Set_Columns(columns)
+        for delim in LIST__delimiters:
+            for line in LIST__corpus:
+                raw_str = line.replace(",", delim)
+                for enclosers in LIST__enclosers:
+                    for keep_enclosers in [True, False]:
+                        expected = _reference_project(_reference_tokenize(
+                                raw_str, delim, enclosers, keep_enclosers),
+                                columns, raw_str)
+                        if enclosers:
+                            result = reader._process_raw(raw_str, delim,
+                                    enclosers, keep_enclosers)
+                        else:
+                            result = reader._process_raw__SIMPLE(raw_str,
+                                    delim)
+                        assert result == expected, [raw_str, delim, enclosers,
+                                keep_enclosers, columns, result, expected]
+                        count += 1
+    return count
+
+
+
+# Main #########################################################################
+
+if __name__ == "__main__":
+    print("{N} cases checked.".format(N = test_tokenizer()))